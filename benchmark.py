@@ -0,0 +1,159 @@
+"""
+签到流程压测
+启动本地模拟微博服务，用 N个账号 × M个超话 驱动WeiboSuperTopicSigner或main()，
+统计每秒签到数、请求延迟p50/p99和内存峰值。默认不等待（--pacing-scale 0）。
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import main
+from mock_weibo import MockWeiboServer, MockWeiboState
+
+class RecordingTransport(main.Transport):
+    """记录每个请求耗时的传输层"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+        self._lock = threading.Lock()
+
+    def create_session(self):
+        session = super().create_session()
+        session.hooks['response'].append(self._record)
+        return session
+
+    def _record(self, response, *args, **kwargs):
+        with self._lock:
+            self.latencies.append(response.elapsed.total_seconds())
+
+def use_data_dir(path):
+    """将超话列表、结果、日志和状态文件都放到指定目录"""
+    main.ACCOUNTS_FILE = os.path.join(path, 'weibo_accounts.json')
+    main.TOPICS_FILE_PREFIX = os.path.join(path, 'supertopics_')
+    main.TOPICS_DB = os.path.join(path, 'supertopics.db')
+    main.RESULTS_DIR = os.path.join(path, 'results')
+    main.LOGS_DIR = os.path.join(path, 'logs')
+    main.STATE_DIR = os.path.join(path, 'state')
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(pct / 100 * len(values))) - 1))
+    return values[index]
+
+def measure(func):
+    """执行func，返回(结果, 耗时, Python内存峰值MB)"""
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    try:
+        result = func()
+    finally:
+        elapsed = time.perf_counter() - start_time
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, elapsed, peak / 1024 / 1024
+
+def bench_signer(args, server, accounts):
+    """直接调用run_accounts/run_accounts_async"""
+    logger = logging.getLogger('benchmark')
+    transport = RecordingTransport({'pool_maxsize': max(args.workers, args.io_threads)})
+    signer_kwargs = {
+        'transport': transport,
+        'pacing_scale': args.pacing_scale,
+        'base_url': server.url,
+        'skip_signed': False
+    }
+    if args.backend == 'async':
+        run = lambda: main.run_accounts_async(accounts, logger, io_threads=args.io_threads, **signer_kwargs)
+    else:
+        run = lambda: main.run_accounts(accounts, logger, workers=args.workers, **signer_kwargs)
+    summaries, elapsed, peak = measure(run)
+    transport.close()
+    signed = sum(s['signed'] for s in summaries)
+    return signed, elapsed, peak, transport.latencies
+
+def bench_main(args, server, accounts, data_dir):
+    """通过命令行入口main()执行完整流程"""
+    with open(main.ACCOUNTS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(accounts, f, ensure_ascii=False)
+    main.WEIBO_BASE_URL = server.url
+    argv = ['main.py', '--pacing-scale', str(args.pacing_scale), '--no-skip-signed',
+            '--backend', args.backend, '-w', str(args.workers), '--io-threads', str(args.io_threads)]
+
+    def run():
+        old_argv = sys.argv
+        sys.argv = argv
+        try:
+            # 控制台日志量很大，压测时丢弃
+            with contextlib.redirect_stderr(io.StringIO()):
+                main.main()
+        finally:
+            sys.argv = old_argv
+            for handler in list(logging.getLogger('weibo_super_topic').handlers):
+                handler.close()
+                logging.getLogger('weibo_super_topic').removeHandler(handler)
+
+    before = server.state.stats()
+    _, elapsed, peak = measure(run)
+    after = server.state.stats()
+    signed = after['counts'].get('checkin 200', 0) - before['counts'].get('checkin 200', 0)
+    # main()内部创建Session，无法记录客户端耗时，使用服务端处理耗时
+    latencies = after['latencies'].get('checkin', [])[len(before['latencies'].get('checkin', [])):]
+    return signed, elapsed, peak, latencies
+
+def report(name, args, signed, elapsed, peak, latencies):
+    print(f"\n[{name}] {args.accounts} 个账号 × {args.topics} 个超话，backend={args.backend}，"
+          f"workers={args.workers}")
+    print(f"  签到请求: {signed}，耗时: {elapsed:.2f}秒，吞吐: {signed / elapsed if elapsed else 0:.1f} 个/秒")
+    print(f"  请求延迟: p50={percentile(latencies, 50) * 1000:.1f}ms，"
+          f"p99={percentile(latencies, 99) * 1000:.1f}ms（{len(latencies)} 个请求）")
+    print(f"  Python内存峰值: {peak:.1f}MB，进程RSS峰值: {peak_rss()}")
+
+def peak_rss():
+    """进程RSS峰值，resource模块只在POSIX系统上可用"""
+    try:
+        import resource
+    except ImportError:
+        return '-'
+    return f"{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f}MB"
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='签到流程压测（使用本地模拟微博服务）')
+    parser.add_argument('--accounts', type=int, default=10, help='账号数')
+    parser.add_argument('--topics', type=int, default=100, help='每个账号的超话数')
+    parser.add_argument('--mode', choices=['signer', 'main', 'both'], default='both',
+                        help='signer直接调用签到器，main通过命令行入口执行')
+    parser.add_argument('--backend', choices=['thread', 'async'], default='thread')
+    parser.add_argument('-w', '--workers', type=int, default=4)
+    parser.add_argument('--io-threads', type=int, default=16)
+    parser.add_argument('--pacing-scale', type=float, default=0.0, help='等待时间倍数（默认0，不等待）')
+    parser.add_argument('--latency', type=float, nargs=2, default=(0.005, 0.02), metavar=('MIN', 'MAX'),
+                        help='模拟服务的响应延迟范围（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='模拟服务返回HTTP 500的概率')
+    args = parser.parse_args()
+
+    logging.getLogger('benchmark').addHandler(logging.NullHandler())
+    logging.getLogger('benchmark').propagate = False
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        use_data_dir(data_dir)
+        state = MockWeiboState(latency=tuple(args.latency), error_rate=args.error_rate)
+        accounts = state.make_accounts(args.accounts, args.topics)
+        with MockWeiboServer(state) as server:
+            if args.mode in ('signer', 'both'):
+                report('signer', args, *bench_signer(args, server, accounts))
+            if args.mode in ('main', 'both'):
+                report('main', args, *bench_main(args, server, accounts, data_dir))
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,26 @@
+"""
+测试公共fixture
+"""
+
+import os
+
+import pytest
+
+import main
+
+# 超话列表、结果、日志和状态文件在数据目录中的位置
+DATA_PATHS = {
+    'ACCOUNTS_FILE': 'weibo_accounts.json',
+    'TOPICS_FILE_PREFIX': 'supertopics_',
+    'TOPICS_DB': 'supertopics.db',
+    'RESULTS_DIR': 'results',
+    'LOGS_DIR': 'logs',
+    'STATE_DIR': 'state'
+}
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """将main的数据文件路径指向临时目录，测试结束后恢复"""
+    for name, relative in DATA_PATHS.items():
+        monkeypatch.setattr(main, name, os.path.join(str(tmp_path), relative))
+    return tmp_path
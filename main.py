@@ -1,13 +1,44 @@
-import requests
+import abc
+import atexit
+import contextvars
+import functools
 import json
 import time
 import random
 import os
 import argparse
 import logging
+import logging.handlers
+import queue
+import re
+import sqlite3
+import subprocess
 import sys
-from datetime import datetime
-from urllib.parse import unquote
+import tempfile
+import hashlib
+import heapq
+import importlib
+import types
+import zlib
+from contextlib import contextmanager
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs, quote, unquote, urlencode, urlsplit
+
+class LazyModule(types.ModuleType):
+    """第一次访问属性时才导入的模块
+    
+    requests和asyncio导入较慢，--list、--dry-run等不发送请求的命令不需要导入。
+    """
+    def __getattr__(self, name):
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, name)
+
+requests = LazyModule('requests')
+asyncio = LazyModule('asyncio')
 
 # 配置文件路径
 current_path = os.path.realpath(__file__)
@@ -16,6 +47,9 @@ ACCOUNTS_FILE = os.path.join(directory_path,'weibo_accounts.json')  # 存储多
 TOPICS_FILE_PREFIX = os.path.join(directory_path,'supertopics_')    # 每个账号的超话列表文件前缀
 RESULTS_DIR = os.path.join(directory_path,'results')                # 结果保存目录
 LOGS_DIR = os.path.join(directory_path,'logs')                      # 日志保存目录
+WEIBO_BASE_URL = os.environ.get('WEIBO_BASE_URL', 'https://weibo.com')  # 微博地址，测试时可指向本地模拟服务
+STATE_DIR = os.path.join(directory_path,'state')                    # 签到状态保存目录
+TOPICS_DB = os.path.join(directory_path,'supertopics.db')           # 所有账号共用的超话列表数据库
 
 # 请求头，根据需要修改
 HEADERS = {
@@ -26,16 +60,1655 @@ HEADERS = {
     'Connection': 'keep-alive'    
 }
 
+# 网络传输设置，可以根据需要修改
+TRANSPORT_SETTINGS = {
+    'pool_connections': 4,      # 按主机缓存的连接池数量
+    'pool_maxsize': 32,         # 每个主机最多保持的keep-alive连接数
+    'connect_timeout': 5,       # 建立连接超时（秒）
+    'read_timeout': 20,         # 读取响应超时（秒）
+    'http2': False              # 使用HTTP/2多路复用（需要安装 httpx[http2]）
+}
+
+class HTTPXAdapter:
+    """使用httpx发送请求的requests适配器（实现send/close接口），支持HTTP/2
+    
+    直接使用httpx的连接层（不经过httpx.Client），因此不会在账号之间共享Cookie，
+    Cookie和重定向仍由各账号自己的requests.Session处理。
+    Session的verify、cert和proxies设置在创建连接层时生效，每种设置组合使用一个连接层。
+    """
+    def __init__(self, httpx_module, pool_maxsize, timeout):
+        self.httpx = httpx_module
+        self.default_timeout = timeout
+        self.pool_maxsize = pool_maxsize
+        self.transports = {}    # (verify, cert, 代理地址) -> httpx连接层
+        self._lock = threading.Lock()
+
+    def transport_for(self, url, verify=True, cert=None, proxies=None):
+        """返回与请求的证书和代理设置对应的连接层"""
+        proxy = requests.utils.select_proxy(url, proxies) if proxies else None
+        cert = tuple(cert) if isinstance(cert, list) else cert
+        key = (verify, cert, proxy)
+        with self._lock:
+            transport = self.transports.get(key)
+            if transport is None:
+                transport = self.httpx.HTTPTransport(
+                    http2=True, verify=self._ssl_context(verify, cert), proxy=proxy,
+                    limits=self.httpx.Limits(max_connections=self.pool_maxsize,
+                                             max_keepalive_connections=self.pool_maxsize)
+                )
+                self.transports[key] = transport
+            return transport
+
+    @staticmethod
+    def _ssl_context(verify, cert):
+        """按requests的verify（是否验证或CA证书路径）和cert（客户端证书）创建SSLContext"""
+        import ssl
+        if verify is False:
+            context = ssl.create_default_context()
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+        elif isinstance(verify, str):
+            if os.path.isdir(verify):
+                context = ssl.create_default_context(capath=verify)
+            else:
+                context = ssl.create_default_context(cafile=verify)
+        else:
+            context = ssl.create_default_context(cafile=requests.certs.where())
+        if cert:
+            certfile, keyfile = cert if isinstance(cert, tuple) else (cert, None)
+            context.load_cert_chain(certfile, keyfile)
+        return context
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        transport = self.transport_for(request.url, verify, cert, proxies)
+        connect_timeout, read_timeout = self._split_timeout(timeout)
+        httpx_request = self.httpx.Request(
+            request.method, request.url, headers=list(request.headers.items()), content=request.body or b'',
+            extensions={'timeout': {'connect': connect_timeout, 'read': read_timeout,
+                                    'write': read_timeout, 'pool': connect_timeout}}
+        )
+        try:
+            httpx_response = transport.handle_request(httpx_request)
+            try:
+                content = httpx_response.read()
+            finally:
+                httpx_response.close()
+        except self.httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(e, request=request)
+        except self.httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(e, request=request)
+        
+        response = requests.models.Response()
+        response.status_code = httpx_response.status_code
+        response.reason = httpx_response.reason_phrase
+        response.headers = requests.structures.CaseInsensitiveDict(httpx_response.headers.items())
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response._content = content
+        response._content_consumed = True
+        
+        # 按requests的方式提供原始响应头，Session据此保存Set-Cookie
+        from http.client import HTTPMessage
+        message = HTTPMessage()
+        for key, value in httpx_response.headers.multi_items():
+            message[key] = value
+        response.raw = types.SimpleNamespace(_original_response=types.SimpleNamespace(msg=message))
+        requests.cookies.extract_cookies_to_jar(response.cookies, request, response.raw)
+        return response
+
+    def _split_timeout(self, timeout):
+        timeout = timeout or self.default_timeout
+        if isinstance(timeout, tuple):
+            return timeout
+        return timeout, timeout
+
+    def close(self):
+        with self._lock:
+            transports = list(self.transports.values())
+            self.transports.clear()
+        for transport in transports:
+            transport.close()
+
+class Transport:
+    """所有签到器共享的网络传输层
+    
+    各账号的Session挂载同一个适配器，共享到weibo.com的TCP/TLS连接池，
+    Cookie仍保存在各自的Session中互不影响。所有请求都使用统一的连接/读取超时。
+    """
+    def __init__(self, settings=None, logger=None):
+        self.settings = dict(TRANSPORT_SETTINGS)
+        if settings:
+            self.settings.update(settings)
+        self.logger = logger or logging.getLogger(__name__)
+        self.timeout = (self.settings['connect_timeout'], self.settings['read_timeout'])
+        self._adapter = None
+
+    @property
+    def adapter(self):
+        """共享的连接池，第一次创建Session时才创建"""
+        if self._adapter is None:
+            self._adapter = self._create_adapter()
+        return self._adapter
+
+    def _create_adapter(self):
+        if self.settings['http2']:
+            try:
+                import httpx
+                import h2  # noqa: F401  httpx的HTTP/2支持依赖h2
+                return HTTPXAdapter(httpx, self.settings['pool_maxsize'], self.timeout)
+            except ImportError:
+                self.logger.warning("未安装 httpx[http2]，使用HTTP/1.1连接池")
+        return requests.adapters.HTTPAdapter(
+            pool_connections=self.settings['pool_connections'],
+            pool_maxsize=self.settings['pool_maxsize']
+        )
+
+    def create_session(self):
+        """创建使用共享连接池的Session"""
+        session = requests.Session()
+        session.mount('https://', self.adapter)
+        session.mount('http://', self.adapter)
+        session.headers.update(HEADERS)
+        return session
+
+    def create_standalone_session(self):
+        """创建使用单独连接的Session
+        
+        关闭Session会关闭挂载的适配器，用完即关闭的Session（如刷新cookies）不能挂载共享连接池，
+        否则会清空所有账号正在使用的连接。
+        """
+        session = requests.Session()
+        session.headers.update(HEADERS)
+        return session
+
+    def close(self):
+        if self._adapter is not None:
+            self._adapter.close()
+
+# 直方图的分桶上限（秒）
+METRICS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 90, 180)
+
+class Metrics:
+    """运行指标统计
+    
+    按接口、账号记录等待时间、请求耗时、JSON解析耗时、HTTP状态码和签到结果码，
+    可以导出为Prometheus文本格式（写入文件或通过本地HTTP端口提供）。
+    span()记录check_login、get_supertopics、sign_topic等步骤的耗时，
+    设置trace_file后同时以JSON行的形式写出每个span。
+    """
+    def __init__(self, buckets=METRICS_BUCKETS, trace_file=None):
+        self.buckets = tuple(buckets)
+        self.trace_file = trace_file
+        self.histograms = {}    # (指标名, 标签) -> [各分桶计数, 总和, 次数]
+        self.counters = {}      # (指标名, 标签) -> 次数
+        self._lock = threading.Lock()
+        self._server = None
+
+    def observe(self, name, value, **labels):
+        """记录一次直方图观测值"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def inc(self, name, amount=1, **labels):
+        """计数器加一"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    @contextmanager
+    def span(self, name, account):
+        """记录一个步骤的耗时"""
+        start = time.time()
+        status = 'ok'
+        try:
+            yield
+        except BaseException:
+            status = 'error'
+            raise
+        finally:
+            duration = time.time() - start
+            self.observe('weibo_span_seconds', duration, span=name, account=account)
+            if self.trace_file:
+                record = {'name': name, 'account': account, 'start': start, 'duration': duration,
+                          'status': status, 'thread': threading.current_thread().name}
+                with self._lock, open(self.trace_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    @staticmethod
+    def _format_labels(labels, extra=None):
+        items = list(labels) + list(extra or [])
+        if not items:
+            return ''
+        escape = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in items) + '}'
+
+    def render(self):
+        """返回Prometheus文本格式的指标"""
+        lines = []
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+        
+        current = None
+        for (name, labels), (bucket_counts, total, count) in histograms:
+            if name != current:
+                lines.append(f"# TYPE {name} histogram")
+                current = name
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                lines.append(f"{name}_bucket{self._format_labels(labels, [('le', bound)])} {bucket_count}")
+            lines.append(f"{name}_bucket{self._format_labels(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{name}_sum{self._format_labels(labels)} {total}")
+            lines.append(f"{name}_count{self._format_labels(labels)} {count}")
+        for (name, labels), value in counters:
+            if name != current:
+                lines.append(f"# TYPE {name} counter")
+                current = name
+            lines.append(f"{name}{self._format_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """将指标写入文件（先写临时文件再替换）"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def serve(self, port, host='127.0.0.1'):
+        """在后台线程中通过 http://host:port/metrics 提供指标"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address[1]
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+# 默认的指标统计，所有签到器共享
+METRICS = Metrics()
+
+# 请求间隔范围（秒），可以根据需要修改
+PACING_RANGES = {
+    'page': (1, 3),       # 获取超话列表每一页之前
+    'sign': (15, 35),     # 每个超话签到之前
+    'account': (60, 90)   # 账号之间
+}
+
+class Pacer:
+    """请求节奏控制，每个账号一个实例，按请求类型生成随机等待时间
+    
+    scale为所有等待时间的倍数，0表示不等待（用于本地测试）。
+    min_delays为各请求类型的最小等待时间，缩小scale时等待时间不低于该值。
+    """
+    def __init__(self, ranges=None, scale=1.0, min_delays=None):
+        self.ranges = dict(PACING_RANGES)
+        if ranges:
+            self.ranges.update(ranges)
+        self.scale = scale
+        self.min_delays = dict(min_delays or {})
+
+    def base_delay(self, kind):
+        """按范围和倍数生成的随机等待时间"""
+        low, high = self.ranges[kind]
+        return random.uniform(low, high) * self.scale
+
+    def next_delay(self, kind):
+        """返回指定请求类型的下一次等待时间（秒）"""
+        return max(self.base_delay(kind), self.min_delays.get(kind, 0.0))
+
+    def record(self, kind, latency, outcome):
+        """记录请求结果，outcome为PACE_OK、PACE_FAILED或PACE_THROTTLED，固定节奏不做处理"""
+        pass
+
+# 请求结果分类，供节奏控制使用
+PACE_OK = 'ok'                  # 请求成功
+PACE_FAILED = 'failed'          # 请求完成但业务失败，不影响节奏
+PACE_THROTTLED = 'throttled'    # HTTP 429/5xx、超时或限流提示，需要退避
+
+# 表示请求过快被限制的返回信息关键字
+RATE_LIMIT_KEYWORDS = ('频繁', '太快', '稍后再试', '次数过多')
+# 接口返回的信息中表示登录已失效的关键词
+LOGGED_OUT_KEYWORDS = ('请先登录', '未登录', '登录失效')
+
+# 自适应节奏参数
+ADAPTIVE_PACING = {
+    'fast_latency': 1.0,    # 成功且响应时间低于该值（秒）时缩短间隔
+    'speedup': 0.9,         # 每次快速成功后间隔倍数乘以该值
+    'backoff': 2.0,         # 每次被限制后间隔倍数乘以该值
+    'min_factor': 0.5,      # 间隔倍数下限
+    'max_factor': 16.0      # 间隔倍数上限
+}
+
+def is_rate_limited_message(msg):
+    """判断接口返回的信息是否表示请求过快"""
+    return any(keyword in (msg or '') for keyword in RATE_LIMIT_KEYWORDS)
+
+def is_logged_out_message(msg):
+    """判断接口返回的信息是否表示登录已失效"""
+    return any(keyword in (msg or '') for keyword in LOGGED_OUT_KEYWORDS)
+
+def request_error_outcome(error):
+    """根据请求异常判断是否需要退避"""
+    response = getattr(error, 'response', None)
+    if response is not None and (response.status_code == 429 or response.status_code >= 500):
+        return PACE_THROTTLED
+    if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+        return PACE_THROTTLED
+    return PACE_FAILED
+
+class AdaptivePacer(Pacer):
+    """根据服务器响应自动调整等待时间的节奏控制
+    
+    每种请求类型维护一个间隔倍数：响应快且成功时逐步缩小（不低于min_factor），
+    遇到HTTP 429/5xx、超时或限流提示时按指数放大并加入随机抖动（不超过max_factor）。
+    """
+    def __init__(self, ranges=None, scale=1.0, settings=None, min_delays=None):
+        super().__init__(ranges, scale, min_delays)
+        self.settings = dict(ADAPTIVE_PACING)
+        if settings:
+            self.settings.update(settings)
+        self.factors = {}
+        self._lock = threading.Lock()
+
+    def base_delay(self, kind):
+        return super().base_delay(kind) * self.factors.get(kind, 1.0)
+
+    def record(self, kind, latency, outcome):
+        with self._lock:
+            factor = self.factors.get(kind, 1.0)
+            if outcome == PACE_THROTTLED:
+                factor = max(factor, 1.0) * self.settings['backoff'] * random.uniform(1.0, 1.25)
+            elif outcome == PACE_OK and latency is not None and latency < self.settings['fast_latency']:
+                factor *= self.settings['speedup']
+            self.factors[kind] = min(self.settings['max_factor'], max(self.settings['min_factor'], factor))
+
+class TokenBucketPacer(Pacer):
+    """带随机抖动的令牌桶，供异步签到器使用
+    
+    每种请求类型一个容量为1的令牌桶，令牌的补充间隔在对应范围内随机取值。
+    等待在事件循环中进行，不占用线程，同一事件循环上的账号可以同时推进。
+    """
+    def __init__(self, ranges=None, scale=1.0, min_delays=None):
+        super().__init__(ranges, scale, min_delays)
+        self._next_at = {}
+
+    async def acquire(self, kind):
+        """等待下一个令牌，返回实际等待的秒数"""
+        now = asyncio.get_running_loop().time()
+        # 令牌桶初始为空，避免所有账号在启动时同时发出第一个请求
+        next_at = self._next_at.get(kind, now + self.next_delay(kind))
+        self._next_at[kind] = max(next_at, now) + self.next_delay(kind)
+        wait = max(0.0, next_at - now)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+class AdaptiveTokenBucketPacer(AdaptivePacer, TokenBucketPacer):
+    """令牌补充间隔随服务器响应自动调整的令牌桶，供异步签到器使用"""
+    pass
+
+# 超话列表缓存有效期（秒），过期后自动增量同步
+TOPICS_TTL = 7 * 24 * 3600
+
+# 获取超话列表时同时请求的页数
+PAGE_CONCURRENCY = 3
+
+# 超话列表每页的超话数，用于估计请求数
+TOPICS_PER_PAGE = 20
+
+# 各接口的全局请求速率上限（次/秒），所有账号共享，None表示不限制
+ENDPOINT_RATE_LIMITS = {
+    'login': None,      # https://weibo.com/
+    'topics': None,     # ajax/profile/topicContent
+    'checkin': None     # p/aj/general/button
+}
+
+SCHEDULER_MAX_QUEUE = 2  # 每个账号在每个接口上最多参与轮转的请求数，超出的请求等待前面的请求发出
+
+# 签到请求中每个超话都相同的参数，每个账号只编码一次
+CHECKIN_PARAMS = {
+    'ajwvr': '6',
+    'api': 'http://i.huati.weibo.com/aj/super/checkin',
+    'texta': '签到',
+    'textb': '已签到',
+    'status': '0',
+    'location': 'page_极速版超话_super_index',
+    'timezone': 'GMT+0800',
+    'lang': 'zh-cn',
+    'plat': 'Win32',
+    'ua': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36 Edg/136.0.0.0',
+    'screen': '1366*768'
+}
+
+# 批量签到接口，一次请求签到多个超话。需要用 --bulk-checkin 开启，服务器不支持时自动退回逐个签到
+BULK_CHECKIN_PATH = '/p/aj/general/batch_button'
+BULK_CHECKIN_SIZE = 20  # 每次批量签到的超话数
+
+# 各微博地址是否支持批量签到（地址 -> bool），第一次批量签到时探测，所有账号共用
+BULK_CHECKIN_SUPPORT = {}
+
+class EndpointScheduler:
+    """所有账号共享的接口级限速调度器
+    
+    按接口限制全局每秒请求数。等待发送的请求按账号排队，时间片在有请求排队的账号之间轮流分配，
+    一个账号排了很多请求也不会挡住其他账号。每个账号在每个接口上最多max_queue个请求参与轮转，
+    超出的请求等本账号排在前面的请求发出后再加入。
+    下一个时间片在上一个时间片到达时才分配，因此新加入的账号在下一轮就能分到时间片。
+    同时记录每个账号的排队深度和等待时间。
+    """
+    def __init__(self, rates=None, max_queue=SCHEDULER_MAX_QUEUE):
+        self.rates = dict(ENDPOINT_RATE_LIMITS)
+        if rates:
+            self.rates.update(rates)
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._next_slot = {}    # 接口 -> 下一个可用时间片
+        self._queues = {}       # 接口 -> {账号: 参与轮转的请求}
+        self._overflow = {}     # 接口 -> {账号: 超出max_queue、等待加入轮转的请求}
+        self._rotation = {}     # 接口 -> 有请求排队的账号，按轮到的先后顺序
+        self._granted = {}      # 接口 -> 已分配时间片但时间片尚未到达的请求
+        self.stats = {}         # (接口, 账号) -> 统计信息
+
+    def _enqueue(self, endpoint, waiter):
+        with self._lock:
+            queues = self._queues.setdefault(endpoint, {})
+            overflow = self._overflow.setdefault(endpoint, {}).setdefault(waiter.account, deque())
+            queue = queues.get(waiter.account)
+            if queue is None:
+                queue = queues[waiter.account] = deque()
+                self._rotation.setdefault(endpoint, deque()).append(waiter.account)
+            if len(queue) < self.max_queue:
+                queue.append(waiter)
+            else:
+                overflow.append(waiter)
+            stat = self.stats.setdefault((endpoint, waiter.account), {
+                'requests': 0, 'total_wait': 0.0, 'max_wait': 0.0, 'max_queue': 0
+            })
+            stat['max_queue'] = max(stat['max_queue'], len(queue) + len(overflow))
+            self._dispatch(endpoint)
+
+    def _dispatch(self, endpoint):
+        """把下一个时间片分配给轮到的账号排在最前的请求（调用方持有锁）"""
+        rotation = self._rotation.get(endpoint)
+        if self._granted.get(endpoint) or not rotation:
+            return
+        account = rotation.popleft()
+        queue = self._queues[endpoint][account]
+        waiter = queue.popleft()
+        overflow = self._overflow[endpoint][account]
+        if overflow:
+            queue.append(overflow.popleft())
+        if queue:
+            rotation.append(account)
+        else:
+            del self._queues[endpoint][account]
+        
+        now = time.monotonic()
+        waiter.slot = max(now, self._next_slot.get(endpoint, now))
+        self._next_slot[endpoint] = waiter.slot + 1.0 / self.rates[endpoint]
+        self._granted[endpoint] = waiter
+        
+        wait = waiter.slot - waiter.enqueued
+        stat = self.stats[(endpoint, account)]
+        stat['requests'] += 1
+        stat['total_wait'] += wait
+        stat['max_wait'] = max(stat['max_wait'], wait)
+        waiter.wake()
+
+    def _finish(self, endpoint, waiter):
+        """请求的时间片已到达（或请求被取消），分配下一个时间片"""
+        with self._lock:
+            if self._granted.get(endpoint) is waiter:
+                self._granted[endpoint] = None
+            elif waiter.slot is None:
+                for queues in (self._queues, self._overflow):
+                    queue = queues.get(endpoint, {}).get(waiter.account)
+                    if queue and waiter in queue:
+                        queue.remove(waiter)
+                queue = self._queues[endpoint].get(waiter.account)
+                if queue is not None:
+                    # 取消的请求空出的位置由等待加入轮转的请求补上
+                    overflow = self._overflow[endpoint][waiter.account]
+                    while overflow and len(queue) < self.max_queue:
+                        queue.append(overflow.popleft())
+                    if not queue:
+                        del self._queues[endpoint][waiter.account]
+                        self._rotation[endpoint].remove(waiter.account)
+            self._dispatch(endpoint)
+
+    def acquire(self, endpoint, account):
+        """阻塞直到获得发送时间片，返回等待的秒数"""
+        if not self.rates.get(endpoint):
+            return 0.0
+        granted = threading.Event()
+        waiter = types.SimpleNamespace(account=account, enqueued=time.monotonic(), slot=None, wake=granted.set)
+        self._enqueue(endpoint, waiter)
+        try:
+            granted.wait()
+            wait = waiter.slot - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+        finally:
+            self._finish(endpoint, waiter)
+        return max(0.0, waiter.slot - waiter.enqueued)
+
+    async def acquire_async(self, endpoint, account):
+        """acquire的异步版本，等待期间不阻塞事件循环"""
+        if not self.rates.get(endpoint):
+            return 0.0
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+        
+        def wake():
+            # 时间片可能在其他线程中分配
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(None))
+        
+        waiter = types.SimpleNamespace(account=account, enqueued=time.monotonic(), slot=None, wake=wake)
+        self._enqueue(endpoint, waiter)
+        try:
+            await granted
+            wait = waiter.slot - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        finally:
+            self._finish(endpoint, waiter)
+        return max(0.0, waiter.slot - waiter.enqueued)
+
+    def queue_depth(self, endpoint):
+        """返回指定接口当前排队的请求数"""
+        with self._lock:
+            queued = sum(len(q) for queues in (self._queues, self._overflow)
+                         for q in queues.get(endpoint, {}).values())
+            return queued + (1 if self._granted.get(endpoint) else 0)
+
+    def report(self, logger):
+        """输出各接口、各账号的排队统计"""
+        if not self.stats:
+            return
+        logger.info("接口限速统计:")
+        for (endpoint, account), stat in sorted(self.stats.items()):
+            avg_wait = stat['total_wait'] / stat['requests'] if stat['requests'] else 0.0
+            logger.info(f"  {endpoint} [{account}] 请求: {stat['requests']}，平均等待: {avg_wait:.2f}秒，"
+                        f"最长等待: {stat['max_wait']:.2f}秒，最大排队: {stat['max_queue']}")
+
+def read_jsonl(path):
+    """逐行读取JSONL文件，跳过无法解析的行（进程中断时最后一行可能不完整）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+class SignStateIndex:
+    """账号当天的签到状态索引
+    
+    每条签到结果追加写入 state/signed_<账号>_<日期>.jsonl，重新运行时读取该文件，
+    跳过当天已经签到成功的超话，只重试失败的超话。日期变化后自动切换到新文件。
+    """
+    def __init__(self, account_name, logger=None):
+        self.account_name = account_name
+        self.logger = logger or logging.getLogger(__name__)
+        self.day = None
+        self.path = None
+        self.signed = set()
+        self._lock = threading.Lock()
+
+    def _ensure_day(self):
+        """日期变化时重新加载对应日期的索引"""
+        day = datetime.now().strftime("%Y%m%d")
+        if day == self.day:
+            return
+        self.day = day
+        self.path = os.path.join(STATE_DIR, f"signed_{self.account_name}_{day}.jsonl")
+        self.signed = set()
+        if not os.path.exists(self.path):
+            return
+        try:
+            for record in read_jsonl(self.path):
+                if record.get('status') == 'success':
+                    self.signed.add(record['containerid'])
+            self.logger.info(f"[{self.account_name}] 今日已签到 {len(self.signed)} 个超话")
+        except Exception as e:
+            self.logger.error(f"[{self.account_name}] 加载签到状态时出错: {str(e)}", exc_info=True)
+
+    def is_signed(self, containerid):
+        """判断超话今天是否已经签到成功"""
+        with self._lock:
+            self._ensure_day()
+            return containerid in self.signed
+
+    def mark(self, result):
+        """记录一条签到结果"""
+        with self._lock:
+            self._ensure_day()
+            try:
+                os.makedirs(STATE_DIR, exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({
+                        'containerid': result['containerid'],
+                        'status': result['status'],
+                        'timestamp': result['timestamp']
+                    }, ensure_ascii=False) + '\n')
+            except Exception as e:
+                self.logger.error(f"[{self.account_name}] 保存签到状态时出错: {str(e)}", exc_info=True)
+            if result['status'] == 'success':
+                self.signed.add(result['containerid'])
+
+# 签到日志每写入多少条结果执行一次fsync，0表示只flush不fsync
+JOURNAL_FSYNC_EVERY = 10
+
+class RunJournal:
+    """签到过程日志，用于进程中断后继续签到
+    
+    每条签到结果产生后立即追加到 state/journal_<账号>.jsonl 并flush，
+    每fsync_every条执行一次fsync。签到正常结束后删除该文件，
+    因此文件存在就说明上次运行没有完成。继续上次的运行时先压缩日志，
+    只保留已有的签到结果，多次中断后文件也不会越来越大。
+    """
+    def __init__(self, account_name, logger=None, fsync_every=JOURNAL_FSYNC_EVERY):
+        self.account_name = account_name
+        self.logger = logger or logging.getLogger(__name__)
+        self.fsync_every = fsync_every
+        self.path = os.path.join(STATE_DIR, f"journal_{account_name}.jsonl")
+        self._file = None
+        self._unsynced = 0
+
+    def load(self):
+        """读取上次未完成运行的签到结果"""
+        results = []
+        if not os.path.exists(self.path):
+            return results
+        try:
+            for record in read_jsonl(self.path):
+                if record.get('type') == 'result':
+                    results.append(record['result'])
+        except Exception as e:
+            self.logger.error(f"[{self.account_name}] 读取签到日志时出错: {str(e)}", exc_info=True)
+        return results
+
+    def start(self, resume=False):
+        """开始记录本次运行
+        
+        Args:
+            resume (bool): 是否接着上次未完成的运行继续
+            
+        Returns:
+            list: resume时返回上次已经产生的签到结果，否则返回空列表
+        """
+        os.makedirs(STATE_DIR, exist_ok=True)
+        previous = []
+        if resume:
+            previous = self.load()
+            self.logger.info(f"[{self.account_name}] 从签到日志恢复 {len(previous)} 条结果")
+            self.compact(previous)
+        elif os.path.exists(self.path):
+            self.logger.warning(f"[{self.account_name}] 发现上次未完成的签到日志，"
+                                f"本次重新开始（可使用 --resume 继续上次的进度）")
+        
+        self._file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+        self._write({'type': 'run', 'started': datetime.now().isoformat(), 'resume': resume})
+        return previous
+
+    def compact(self, results):
+        """用results重写日志，去掉之前各次运行的记录头、重复的结果和中断时不完整的行"""
+        latest = {r['containerid']: r for r in results}
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for result in latest.values():
+                    f.write(json.dumps({'type': 'result', 'result': result}, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            self.logger.error(f"[{self.account_name}] 压缩签到日志时出错: {str(e)}", exc_info=True)
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        self._unsynced += 1
+        if self.fsync_every and self._unsynced >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        """将已写入的记录落盘"""
+        if self._file and self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def append(self, result):
+        """追加一条签到结果"""
+        if not self._file:
+            return
+        try:
+            self._write({'type': 'result', 'result': result})
+        except Exception as e:
+            self.logger.error(f"[{self.account_name}] 写入签到日志时出错: {str(e)}", exc_info=True)
+
+    def close(self, completed=True):
+        """结束记录，completed为True时删除日志文件"""
+        if not self._file:
+            return
+        try:
+            self.sync()
+            self._file.close()
+            if completed:
+                os.remove(self.path)
+        except Exception as e:
+            self.logger.error(f"[{self.account_name}] 关闭签到日志时出错: {str(e)}", exc_info=True)
+        finally:
+            self._file = None
+
+SESSION_HEALTH_TTL = 6 * 3600  # 登录检查结果的有效期（秒），有效期内不再请求首页检查登录
+PREFLIGHT_WORKERS = 8          # 签到前并发检查登录状态的线程数
+
+class SessionHealthStore:
+    """账号登录状态缓存
+    
+    保存在 state/session_health.json，记录每个账号最近一次登录检查的结果和时间。
+    检查成功且未超过有效期、cookies也没有变化的账号，下次运行时直接认为登录有效。
+    """
+    def __init__(self, logger=None, ttl=SESSION_HEALTH_TTL, path=None, shard=None):
+        self.logger = logger or logging.getLogger(__name__)
+        self.ttl = ttl
+        # 分片进程各自保存，避免同时写入同一个文件
+        name = f"session_health_{shard[0]}of{shard[1]}.json" if shard else 'session_health.json'
+        self.path = path or os.path.join(STATE_DIR, name)
+        self.entries = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    @staticmethod
+    def fingerprint(account):
+        """账号uid和cookies的摘要，更新cookies后缓存自动失效"""
+        data = json.dumps({'uid': account.get('uid'), 'cookies': account.get('cookies', {})}, sort_keys=True)
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()[:16]
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except Exception as e:
+            self.logger.error(f"加载登录状态缓存时出错: {str(e)}", exc_info=True)
+            self.entries = {}
+
+    def is_healthy(self, account_name, account):
+        """账号最近检查登录成功，且仍在有效期内"""
+        with self._lock:
+            entry = self.entries.get(account_name)
+        return bool(entry and entry.get('ok')
+                    and entry.get('fingerprint') == self.fingerprint(account)
+                    and time.time() - entry.get('checked_at', 0) < self.ttl)
+
+    def update(self, account_name, account, ok):
+        """记录一次登录检查的结果"""
+        with self._lock:
+            self.entries[account_name] = {
+                'ok': ok,
+                'checked_at': time.time(),
+                'fingerprint': self.fingerprint(account)
+            }
+
+    def invalidate(self, account_name):
+        """签到失败时清除缓存，下次运行重新检查登录"""
+        with self._lock:
+            self.entries.pop(account_name, None)
+
+    def save(self):
+        """保存缓存（先写临时文件再替换）"""
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with self._lock:
+                data = json.dumps(self.entries, ensure_ascii=False, indent=2)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            self.logger.error(f"保存登录状态缓存时出错: {str(e)}", exc_info=True)
+
+# 微博登录服务地址，测试时可指向本地模拟服务
+PASSPORT_BASE_URL = os.environ.get('WEIBO_PASSPORT_URL', 'https://passport.weibo.com')
+COOKIE_TTL = 7 * 24 * 3600              # 登录服务没有返回过期时间时，cookie的有效期按7天估计
+CREDENTIAL_REFRESH_AHEAD = 24 * 3600    # cookie过期前多久开始刷新（秒）
+CREDENTIAL_CHECK_INTERVAL = 600         # 后台检查cookie是否需要刷新的间隔（秒）
+QRCODE_LOGIN = {
+    'timeout': 180,         # 等待扫码的时间（秒）
+    'poll_interval': 2      # 查询扫码状态的间隔（秒）
+}
+
+def cookie_expires_at(cookies):
+    """从cookie中的ALF（自动登录的过期时间戳）读取过期时间，没有时返回None"""
+    alf = str((cookies or {}).get('ALF', ''))
+    return int(alf) if alf.isdigit() else None
+
+@contextmanager
+def file_lock(path):
+    """进程间互斥的文件锁（锁文件为path.lock），多个分片进程同时修改同一个文件时使用"""
+    with open(f"{path}.lock", 'a+') as f:
+        if os.name == 'nt':
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == 'nt':
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+class CredentialProvider(abc.ABC):
+    """cookie的刷新方式
+    
+    refresh返回 {'cookies': 新的cookies, 'credentials': 需要更新的凭据字段}，失败时返回None。
+    """
+    name = None
+
+    def __init__(self, logger, passport_url=None, transport=None, stop_event=None):
+        self.logger = logger
+        self.passport_url = (passport_url or PASSPORT_BASE_URL).rstrip('/')
+        self.transport = transport or Transport(logger=logger)
+        self.stop_event = stop_event or threading.Event()
+
+    @abc.abstractmethod
+    def refresh(self, account_name, account):
+        """刷新账号的cookies"""
+
+    def expires_at(self, cookies, expires_at=None):
+        return expires_at or cookie_expires_at(cookies) or time.time() + COOKIE_TTL
+
+class RefreshTokenProvider(CredentialProvider):
+    """使用保存的refresh_token换取新的cookies，每次刷新后refresh_token也会更新"""
+    name = 'refresh_token'
+
+    def refresh(self, account_name, account):
+        token = (account.get('credentials') or {}).get('refresh_token')
+        if not token:
+            self.logger.error(f"[{account_name}] 账号配置中没有refresh_token，无法刷新cookies")
+            return None
+        session = self.transport.create_standalone_session()
+        try:
+            response = session.post(f"{self.passport_url}/sso/v2/refresh",
+                                    data={'entry': 'miniblog', 'refresh_token': token},
+                                    timeout=self.transport.timeout)
+            response.raise_for_status()
+            result = response.json()
+            if result.get('retcode') != 20000000:
+                self.logger.warning(f"[{account_name}] 刷新cookies失败: {result.get('msg', '未知错误')}")
+                return None
+            data = result['data']
+            return {
+                'cookies': data['cookies'],
+                'credentials': {
+                    'refresh_token': data.get('refresh_token') or token,
+                    'expires_at': self.expires_at(data['cookies'], data.get('expires_at'))
+                }
+            }
+        except Exception as e:
+            self.logger.error(f"[{account_name}] 刷新cookies时出错: {str(e)}", exc_info=True)
+            return None
+        finally:
+            session.close()
+
+class QRCodeLoginProvider(CredentialProvider):
+    """扫码登录：输出二维码地址，等待用微博App扫码确认后跳转登录获取cookies"""
+    name = 'qrcode'
+    STATUS_WAITING = (50114001, 50114002)   # 未扫码、已扫码未确认
+
+    def refresh(self, account_name, account):
+        session = self.transport.create_standalone_session()
+        try:
+            response = session.get(f"{self.passport_url}/sso/v2/qrcode/image",
+                                   params={'entry': 'miniblog', 'size': 180}, timeout=self.transport.timeout)
+            response.raise_for_status()
+            data = response.json()['data']
+            qrid = data['qrid']
+            self.logger.warning(f"[{account_name}] cookies需要更新，请在{QRCODE_LOGIN['timeout']}秒内"
+                                f"用微博App扫描二维码登录: {data['image']}")
+            
+            deadline = time.time() + QRCODE_LOGIN['timeout']
+            while time.time() < deadline:
+                if self.stop_event.wait(QRCODE_LOGIN['poll_interval']):
+                    return None
+                response = session.get(f"{self.passport_url}/sso/v2/qrcode/check",
+                                       params={'entry': 'miniblog', 'qrid': qrid}, timeout=self.transport.timeout)
+                response.raise_for_status()
+                result = response.json()
+                if result.get('retcode') in self.STATUS_WAITING:
+                    continue
+                if result.get('retcode') != 20000000:
+                    self.logger.warning(f"[{account_name}] 扫码登录失败: {result.get('msg', '未知错误')}")
+                    return None
+                # 跳转登录地址，登录服务在跳转过程中设置weibo.com的cookies
+                session.get(result['data']['url'], timeout=self.transport.timeout).raise_for_status()
+                cookies = requests.utils.dict_from_cookiejar(session.cookies)
+                if 'SUB' not in cookies:
+                    self.logger.warning(f"[{account_name}] 扫码登录后没有获取到cookies")
+                    return None
+                return {'cookies': cookies, 'credentials': {'expires_at': self.expires_at(cookies)}}
+            self.logger.warning(f"[{account_name}] 等待扫码超时")
+            return None
+        except Exception as e:
+            self.logger.error(f"[{account_name}] 扫码登录时出错: {str(e)}", exc_info=True)
+            return None
+        finally:
+            session.close()
+
+CREDENTIAL_PROVIDERS = {cls.name: cls for cls in (RefreshTokenProvider, QRCodeLoginProvider)}
+
+class CredentialManager:
+    """按账号配置的凭据自动刷新cookies
+    
+    账号配置中的credentials指定刷新方式，如
+    {"provider": "refresh_token", "refresh_token": "..."} 或 {"provider": "qrcode"}。
+    后台线程在cookies过期前refresh_ahead秒内刷新，登录检查失败时签到器也会立即请求刷新。
+    刷新后的cookies和凭据更新到账号配置中，并写回账号文件（先写临时文件再替换），
+    账号因此留在本次和以后的签到中。
+    """
+    def __init__(self, logger, accounts_file=None, passport_url=None, transport=None,
+                 refresh_ahead=CREDENTIAL_REFRESH_AHEAD, interval=CREDENTIAL_CHECK_INTERVAL):
+        self.logger = logger
+        self.accounts_file = accounts_file or ACCOUNTS_FILE
+        self.refresh_ahead = refresh_ahead
+        self.interval = interval
+        self.accounts = {}      # 账号名 -> 账号配置
+        self._stop = threading.Event()
+        self.providers = {name: cls(logger, passport_url, transport, self._stop)
+                          for name, cls in CREDENTIAL_PROVIDERS.items()}
+        self._lock = threading.Lock()
+        self._account_locks = {}
+        self._file_lock = threading.Lock()
+        self._thread = None
+
+    def track(self, accounts):
+        """登记需要管理的账号，账号配置刷新时直接修改这些字典
+        
+        每次调用替换之前登记的账号，守护模式重新加载后已移除或不属于本分片的账号不再刷新。
+        """
+        tracked = {account_name_of(idx, account): account for idx, account in enumerate(accounts, 1)}
+        with self._lock:
+            self.accounts = tracked
+
+    def provider_for(self, account):
+        provider = (account.get('credentials') or {}).get('provider')
+        if provider and provider not in self.providers:
+            self.logger.error(f"未知的cookies刷新方式: {provider}（可用: {', '.join(self.providers)}）")
+        return self.providers.get(provider)
+
+    def can_refresh(self, account_name):
+        account = self.accounts.get(account_name)
+        return account is not None and self.provider_for(account) is not None
+
+    def needs_refresh(self, account, now=None):
+        """配置了刷新方式，且没有cookies或cookies即将过期"""
+        if self.provider_for(account) is None:
+            return False
+        if not account.get('cookies'):
+            return True
+        expires_at = (account.get('credentials') or {}).get('expires_at') or cookie_expires_at(account['cookies'])
+        return expires_at is not None and expires_at - (now or time.time()) <= self.refresh_ahead
+
+    def refresh_account(self, account_name, used_cookies=None):
+        """刷新账号的cookies
+        
+        Args:
+            used_cookies (dict): 调用方登录失败时使用的cookies，账号的cookies已经被其他线程刷新时直接返回新的cookies
+        
+        Returns:
+            dict: 新的cookies，无法刷新时返回None
+        """
+        account = self.accounts.get(account_name)
+        provider = self.provider_for(account) if account else None
+        if provider is None:
+            return None
+        with self._lock:
+            lock = self._account_locks.setdefault(account_name, threading.Lock())
+        with lock:
+            if used_cookies is not None and account.get('cookies') and account['cookies'] != used_cookies:
+                return account['cookies']
+            self.logger.info(f"[{account_name}] 通过 {provider.name} 刷新cookies...")
+            result = provider.refresh(account_name, account)
+            if not result:
+                return None
+            account['cookies'] = dict(account.get('cookies') or {}, **result['cookies'])
+            account['credentials'] = dict(account.get('credentials') or {}, **result['credentials'])
+            self.save(account)
+            expires = datetime.fromtimestamp(account['credentials']['expires_at']).strftime('%Y-%m-%d %H:%M')
+            self.logger.info(f"[{account_name}] cookies已刷新，有效期至 {expires}")
+            return account['cookies']
+
+    def refresh_expiring(self, now=None):
+        """刷新所有即将过期的账号，返回刷新成功的账号名"""
+        refreshed = []
+        with self._lock:
+            accounts = list(self.accounts.items())
+        for account_name, account in accounts:
+            if self._stop.is_set():
+                break
+            if self.needs_refresh(account, now) and self.refresh_account(account_name, account.get('cookies') or {}):
+                refreshed.append(account_name)
+        return refreshed
+
+    def save(self, account):
+        """将账号的cookies和凭据写回账号文件，按name和uid匹配，其他账号保持文件中的内容
+        
+        多进程模式下各分片进程都可能写账号文件，读取、修改、写回的整个过程持有文件锁，
+        避免覆盖其他进程刚写入的refresh_token（只能使用一次，丢失后账号无法再刷新）。
+        """
+        with self._file_lock, file_lock(self.accounts_file):
+            tmp_path = None
+            try:
+                with open(self.accounts_file, 'r', encoding='utf-8') as f:
+                    accounts = json.load(f)
+                name = account.get('name')
+                for idx, entry in enumerate(accounts, 1):
+                    # 未命名的账号按name_accounts的规则以在文件中的位置命名
+                    entry_name = account_name_of(idx, entry) if name is not None else entry.get('name')
+                    if entry_name == name and entry.get('uid') == account.get('uid'):
+                        entry['cookies'] = account['cookies']
+                        entry['credentials'] = account['credentials']
+                        break
+                else:
+                    self.logger.warning(f"账号文件中没有账号 {account.get('name')}，刷新后的cookies未保存")
+                    return
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.accounts_file)),
+                                                prefix='.weibo_accounts_', suffix='.tmp')
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(accounts, f, ensure_ascii=False, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.accounts_file)
+                tmp_path = None
+            except Exception as e:
+                self.logger.error(f"保存刷新后的cookies时出错: {str(e)}", exc_info=True)
+            finally:
+                if tmp_path and os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def start(self):
+        """启动后台线程，定期刷新即将过期的cookies"""
+        def loop():
+            while not self._stop.is_set():
+                try:
+                    self.refresh_expiring()
+                except Exception as e:
+                    self.logger.error(f"检查cookies有效期时出错: {str(e)}", exc_info=True)
+                self._stop.wait(self.interval)
+        
+        self._thread = threading.Thread(target=loop, name='credential-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+def is_already_signed(result):
+    """签到时接口返回已经签过（不包括本地记录的今日已签到而跳过的）"""
+    return result.get('status') == 'success' and '已签到' in (result.get('message') or '')
+
+RESULTS_SINKS = ('jsonl', 'sqlite', 'json')  # 签到结果的保存方式，json为每次运行每个账号一个文件
+
+class JsonlResultSink:
+    """按天轮转的签到结果文件
+    
+    每条签到结果产生后立即追加到 results/sign_results_<日期>.jsonl，
+    每行包含账号名和日期，所有账号共用同一个文件。
+    """
+    def __init__(self, results_dir=None, logger=None):
+        self.results_dir = results_dir or RESULTS_DIR
+        self.logger = logger or logging.getLogger(__name__)
+        self.day = None
+        self._file = None
+        self._history = {}  # 开始日期 -> 各账号的历史签到统计
+        self._lock = threading.Lock()
+
+    def path_for(self, day):
+        return os.path.join(self.results_dir, f"sign_results_{day.replace('-', '')}.jsonl")
+
+    def write(self, account_name, result):
+        """追加一条签到结果"""
+        day = result['timestamp'][:10]
+        record = {'account': account_name, 'date': day, **result}
+        try:
+            with self._lock:
+                if day != self.day:
+                    if self._file:
+                        self._file.close()
+                    os.makedirs(self.results_dir, exist_ok=True)
+                    self._file = open(self.path_for(day), 'a', encoding='utf-8')
+                    self.day = day
+                self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+                self._file.flush()
+        except Exception as e:
+            self.logger.error(f"[{account_name}] 写入签到结果时出错: {str(e)}", exc_info=True)
+
+    def topic_history(self, account_name, since=None):
+        """账号各超话的历史签到情况，格式同SqliteResultSink.topic_history
+        
+        第一次调用时读取日期范围内的文件并统计所有账号，之后直接使用统计结果。
+        """
+        with self._lock:
+            cache = self._history.get(since)
+        if cache is None:
+            cache = {}
+            for record in self.iter_results(since):
+                counts = cache.setdefault(record.get('account'), {}).setdefault(record.get('containerid'), [0, 0, 0])
+                counts[0] += 1
+                counts[1] += record.get('status') == 'failed'
+                counts[2] += is_already_signed(record)
+            with self._lock:
+                self._history[since] = cache
+        return {cid: tuple(counts) for cid, counts in cache.get(account_name, {}).items()}
+
+    def iter_results(self, since=None, until=None):
+        """按日期范围读取签到结果，只打开范围内的文件"""
+        if not os.path.isdir(self.results_dir):
+            return
+        for name in sorted(os.listdir(self.results_dir)):
+            if not (name.startswith('sign_results_') and name.endswith('.jsonl')):
+                continue
+            stamp = name[len('sign_results_'):-len('.jsonl')]
+            day = f"{stamp[:4]}-{stamp[4:6]}-{stamp[6:]}"
+            if (since and day < since) or (until and day > until):
+                continue
+            yield from read_jsonl(os.path.join(self.results_dir, name))
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+                self.day = None
+
+class SqliteResultSink:
+    """保存在SQLite数据库中的签到结果，按账号、日期、超话建立索引"""
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sign_results (
+            account TEXT NOT NULL,
+            date TEXT NOT NULL,
+            containerid TEXT NOT NULL,
+            topic TEXT,
+            status TEXT NOT NULL,
+            message TEXT,
+            timestamp TEXT NOT NULL,
+            elapsed REAL,
+            attempts INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS idx_results_account_date ON sign_results (account, date);
+        CREATE INDEX IF NOT EXISTS idx_results_containerid_date ON sign_results (containerid, date);
+        CREATE INDEX IF NOT EXISTS idx_results_date ON sign_results (date);
+    """
+
+    def __init__(self, path=None, logger=None):
+        self.path = path or os.path.join(RESULTS_DIR, 'sign_results.db')
+        self.logger = logger or logging.getLogger(__name__)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        # 多个线程共用一个连接，写入时加锁
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(self.SCHEMA)
+
+    def write(self, account_name, result):
+        """写入一条签到结果"""
+        try:
+            with self._lock, self.conn:
+                self.conn.execute(
+                    'INSERT INTO sign_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (account_name, result['timestamp'][:10], result['containerid'], result.get('topic'),
+                     result['status'], result.get('message'), result['timestamp'], result.get('elapsed'),
+                     result.get('attempts', 1)))
+        except Exception as e:
+            self.logger.error(f"[{account_name}] 写入签到结果时出错: {str(e)}", exc_info=True)
+
+    def topic_history(self, account_name, since=None):
+        """账号各超话的历史签到情况
+        
+        Returns:
+            dict: containerid -> (签到次数, 失败次数, 已经签过的次数)
+        """
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT containerid, COUNT(*), SUM(status = 'failed'), "
+                "SUM(status = 'success' AND message LIKE '%已签到%') "
+                "FROM sign_results WHERE account = ? AND date >= ? GROUP BY containerid",
+                (account_name, since or '')).fetchall()
+        return {cid: (total, failed, already) for cid, total, failed, already in rows}
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+def create_result_sink(kind, logger=None):
+    """按名称创建签到结果的保存方式，json返回None（每次运行保存为单独的文件）"""
+    if kind == 'jsonl':
+        return JsonlResultSink(logger=logger)
+    if kind == 'sqlite':
+        return SqliteResultSink(logger=logger)
+    return None
+
+# 签到结果统计的分组方式
+RESULT_GROUPS = {'topic': 'topic', 'account': 'account', 'date': 'date'}
+
+def query_results(sink, group_by='topic', account=None, since=None, until=None):
+    """统计签到成功率
+    
+    Args:
+        sink: JsonlResultSink或SqliteResultSink
+        group_by (str): 分组方式，topic、account或date
+        account (str): 只统计该账号
+        since/until (str): 日期范围 YYYY-MM-DD（包含）
+        
+    Returns:
+        list: [{'key', 'total', 'success', 'failed', 'skipped', 'rate'}]，按分组排序
+    """
+    column = RESULT_GROUPS[group_by]
+    if isinstance(sink, SqliteResultSink):
+        conditions, params = [], []
+        for clause, value in (('account = ?', account), ('date >= ?', since), ('date <= ?', until)):
+            if value:
+                conditions.append(clause)
+                params.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        with sink._lock:
+            rows = sink.conn.execute(
+                f"SELECT {column}, COUNT(*), SUM(status = 'success'), SUM(status = 'failed'), "
+                f"SUM(status = 'skipped') FROM sign_results {where} GROUP BY {column} ORDER BY {column}",
+                params).fetchall()
+    else:
+        counts = {}
+        for record in sink.iter_results(since, until):
+            if account and record.get('account') != account:
+                continue
+            row = counts.setdefault(record.get(column), [0, 0, 0, 0])
+            row[0] += 1
+            for i, status in enumerate(('success', 'failed', 'skipped'), 1):
+                row[i] += record.get('status') == status
+        rows = [(key, *row) for key, row in sorted(counts.items(), key=lambda item: str(item[0]))]
+    
+    stats = []
+    for key, total, success, failed, skipped in rows:
+        attempted = total - skipped
+        stats.append({
+            'key': key,
+            'total': total,
+            'success': success,
+            'failed': failed,
+            'skipped': skipped,
+            'rate': success / attempted if attempted else None
+        })
+    return stats
+
+# 签到失败后的重试策略（按错误类型）
+#   max_attempts: 最多尝试次数（包含第一次），1表示不重试
+#   delay: 第一次重试前的等待时间（秒），之后每次乘以multiplier，最多max_delay
+RETRY_POLICIES = {
+    'network': {'max_attempts': 3, 'delay': 60, 'multiplier': 2, 'max_delay': 600},
+    'rate_limited': {'max_attempts': 3, 'delay': 300, 'multiplier': 2, 'max_delay': 1800},
+    'invalid_response': {'max_attempts': 2, 'delay': 120, 'multiplier': 2, 'max_delay': 600},
+    'logged_out': {'max_attempts': 2, 'delay': 5, 'multiplier': 1, 'max_delay': 5},  # 重新检查登录后再试一次
+    'rejected': {'max_attempts': 1},    # 接口明确拒绝（如超话不存在），重试没有意义
+    'system': {'max_attempts': 1}       # 程序内部错误
+}
+
+def classify_sign_error(message):
+    """根据sign_topic返回的失败信息判断错误类型"""
+    message = message or ''
+    if message.startswith('网络错误'):
+        return 'network'
+    if message.startswith('系统错误'):
+        return 'system'
+    if message == '响应不是有效的JSON':
+        return 'invalid_response'
+    if is_logged_out_message(message):
+        return 'logged_out'
+    if is_rate_limited_message(message):
+        return 'rate_limited'
+    return 'rejected'
+
+def backoff_delay(policy, attempt):
+    """第attempt次尝试失败后，按重试策略计算下一次尝试前的等待时间（秒），加入±20%的随机抖动"""
+    delay = policy['delay'] * policy.get('multiplier', 1) ** (attempt - 1)
+    return min(delay, policy.get('max_delay', delay)) * random.uniform(0.8, 1.2)
+
+class RetryQueue:
+    """签到失败超话的延迟重试队列
+    
+    失败的超话按错误类型对应的策略计算下一次重试时间，按到期时间先后取出。
+    """
+    def __init__(self, policies=None, delay_scale=1.0):
+        self.policies = dict(RETRY_POLICIES)
+        if policies:
+            self.policies.update(policies)
+        self.delay_scale = delay_scale
+        self._heap = []
+        self._seq = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule(self, topic, attempt, message):
+        """安排失败超话的下一次重试
+        
+        Args:
+            topic (dict): 超话
+            attempt (int): 刚刚失败的是第几次尝试
+            message (str): 失败信息
+            
+        Returns:
+            float: 距离下一次重试的秒数，不再重试时返回None
+        """
+        policy = self.policies.get(classify_sign_error(message), {'max_attempts': 1})
+        if attempt >= policy.get('max_attempts', 1):
+            return None
+        delay = backoff_delay(policy, attempt) * self.delay_scale
+        heapq.heappush(self._heap, (time.time() + delay, self._seq, topic, attempt + 1))
+        self._seq += 1
+        return delay
+
+    def next_due(self):
+        """返回最早一次重试的时间，队列为空时返回None"""
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self):
+        """取出一个已到期的重试，返回(超话, 第几次尝试)，没有到期的返回None"""
+        if self._heap and self._heap[0][0] <= time.time():
+            _, _, topic, attempt = heapq.heappop(self._heap)
+            return topic, attempt
+        return None
+
+PRIORITY_HISTORY_DAYS = 30  # 计算超话优先级时参考最近多少天的签到结果
+
+def topic_priority(weight, history):
+    """超话的签到优先级
+    
+    以账号配置中的权重为基础，按历史上失败和已经签过的比例降低，
+    签到次数较少时比例按 次数/(总数+1) 估计，避免一两次失败就排到最后。
+    """
+    total, failed, already = history or (0, 0, 0)
+    return weight * (1 - failed / (total + 1)) * (1 - already / (total + 1))
+
+def parse_deadline(value, now=None):
+    """解析 --deadline 参数，HH:MM 为当天的时刻（已过则为第二天），+分钟数 为从现在起的时长
+    
+    Returns:
+        float: 截止时间的时间戳
+    """
+    now = now or datetime.now()
+    try:
+        if value.startswith('+'):
+            return (now + timedelta(minutes=float(value[1:]))).timestamp()
+        hour, _, minute = value.partition(':')
+        deadline = now.replace(hour=int(hour), minute=int(minute), second=0, microsecond=0)
+    except ValueError:
+        raise ValueError(f"无效的截止时间: {value}（格式为 HH:MM 或 +分钟数）")
+    if deadline <= now:
+        deadline += timedelta(days=1)
+    return deadline.timestamp()
+
+class Topic(namedtuple('Topic', ['title', 'containerid'])):
+    """超话记录，只保存签到需要的字段，支持 topic['title'] 形式的访问"""
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key not in self._fields:
+                raise KeyError(key)
+            return getattr(self, key)
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self._fields else default
+
+def topic_dict(topic):
+    return {'title': topic['title'], 'containerid': topic['containerid']}
+
+class StoredTopics:
+    """数据库中某个账号的超话列表，遍历时才分批读取"""
+    __slots__ = ('store', 'account_name', 'count')
+
+    def __init__(self, store, account_name, count):
+        self.store = store
+        self.account_name = account_name
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return self.store.iter_topics(self.account_name)
+
+class TopicStore:
+    """所有账号共用的超话列表数据库（SQLite）
+    
+    每个账号的超话按顺序保存title和containerid，另外记录获取时间、有效期和上次同步的变化。
+    读取时返回StoredTopics，遍历时按位置分批查询，不需要一次加载整个列表。
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS topic_lists (
+            account TEXT PRIMARY KEY,
+            fetched_at REAL,
+            ttl REAL,
+            last_diff TEXT,
+            count INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS topics (
+            account TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            containerid TEXT NOT NULL,
+            title TEXT NOT NULL,
+            PRIMARY KEY (account, position)
+        ) WITHOUT ROWID;
+    """
+    BATCH_SIZE = 500  # 遍历时每次读取的超话数
+
+    def __init__(self, path=None, logger=None, read_only=False):
+        self.path = path or TOPICS_DB
+        self.logger = logger or logging.getLogger(__name__)
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        if read_only:
+            # 只读打开已有的数据库，不创建文件也不修改表结构
+            self.conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        # 多个线程共用一个连接，每次访问时加锁
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(self.SCHEMA)
+
+    def load(self, account_name):
+        """读取账号的超话列表信息，格式同load_topics_cache，没有保存过返回None"""
+        with self._lock:
+            row = self.conn.execute('SELECT fetched_at, ttl, last_diff, count FROM topic_lists WHERE account = ?',
+                                    (account_name,)).fetchone()
+        if row is None:
+            return None
+        fetched_at, ttl, last_diff, count = row
+        return {
+            'fetched_at': fetched_at,
+            'ttl': ttl,
+            'last_diff': json.loads(last_diff) if last_diff else None,
+            'topics': StoredTopics(self, account_name, count)
+        }
+
+    def iter_topics(self, account_name):
+        """按顺序分批读取账号的超话"""
+        position = -1
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    'SELECT position, title, containerid FROM topics WHERE account = ? AND position > ? '
+                    'ORDER BY position LIMIT ?', (account_name, position, self.BATCH_SIZE)).fetchall()
+            for position, title, containerid in rows:
+                yield Topic(title, containerid)
+            if len(rows) < self.BATCH_SIZE:
+                return
+
+    def save(self, account_name, topics, fetched_at, ttl, diff=None):
+        """替换账号的超话列表"""
+        rows = [(account_name, i, t['containerid'], t['title']) for i, t in enumerate(topics)]
+        with self._lock, self.conn:
+            self.conn.execute('DELETE FROM topics WHERE account = ?', (account_name,))
+            self.conn.executemany('INSERT INTO topics VALUES (?, ?, ?, ?)', rows)
+            self.conn.execute('INSERT OR REPLACE INTO topic_lists VALUES (?, ?, ?, ?, ?)',
+                              (account_name, fetched_at, ttl,
+                               json.dumps(diff, ensure_ascii=False) if diff is not None else None, len(rows)))
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
 class WeiboSuperTopicSigner:
-    def __init__(self, account_name=None, logger=None, account_uid=None):
-        self.session = requests.Session()
-        self.session.headers.update(HEADERS)
+    def __init__(self, account_name=None, logger=None, account_uid=None, pacer=None, scheduler=None,
+                 topics_ttl=TOPICS_TTL, full_sync=False, skip_signed=True, resume=False,
+                 fsync_every=JOURNAL_FSYNC_EVERY, adaptive_pacing=False, retry=True, transport=None,
+                 pacing_scale=1.0, base_url=None, metrics=None, login_verified=False, results_sink=None,
+                 topic_store=None, topic_weights=None, deadline=None, pacing_min=None, bulk_checkin=False,
+                 credentials=None, retry_scale=None):
+        # 未指定共享的传输层时使用独立的连接池
+        self.transport = transport or Transport(logger=logger)
+        self._session = None
         self.cookies = None
         self.account_name = account_name or "default"
         self.account_uid = account_uid
+        self.base_url = (base_url or WEIBO_BASE_URL).rstrip('/')
+        self.metrics = metrics or METRICS
         self.topics_file = f"{TOPICS_FILE_PREFIX}{self.account_name}.json"
+        # 所有账号共用的超话列表数据库，为None时每个账号保存为单独的JSON文件
+        self.topic_store = topic_store
         self.logger = logger or logging.getLogger(__name__)
         self.sign_results = []  # 存储签到结果
+        # 每个账号独立的请求节奏
+        self.pacer = pacer or self.create_pacer(adaptive_pacing, pacing_scale, pacing_min)
+        self.scheduler = scheduler     # 多个账号共享的接口限速调度器，可选
+        self.page_concurrency = PAGE_CONCURRENCY
+        self.topics_ttl = topics_ttl   # 超话列表缓存有效期（秒）
+        self.full_sync = full_sync     # 更新超话列表时是否重新获取全部分页
+        self.topics_total = None       # 本次待签到的超话数，边获取边签到时可能未知
+        # 当天的签到状态，用于跳过已签到的超话
+        self.sign_state = SignStateIndex(self.account_name, self.logger) if skip_signed else None
+        # 签到过程日志，resume为True时从上次中断的位置继续
+        self.journal = RunJournal(self.account_name, self.logger, fsync_every)
+        self.resume = resume
+        self.resumed_ids = set()
+        # 失败超话的重试队列，在本次运行中穿插重试。时间预算只压缩请求之间的等待，
+        # 重试的退避时间不随之缩短（retry_scale默认与pacing_scale相同，模拟服务测试时为0）
+        retry_scale = pacing_scale if retry_scale is None else retry_scale
+        self.retry_queue = RetryQueue(delay_scale=retry_scale) if retry else None
+        # 签到前已经检查过登录状态时不再重复检查
+        self.login_verified = login_verified
+        # 签到结果提示未登录（登录状态缓存或预先检查的结果已经过期），下一个超话前重新检查登录
+        self.logged_out = False
+        self.login_rechecked = False
+        # 签到结果产生后立即写入，为None时在运行结束后保存为单独的JSON文件
+        self.results_sink = results_sink
+        # 账号配置中的超话权重（超话名称或containerid -> 权重），与历史签到结果一起决定签到顺序
+        self.topic_weights = topic_weights or {}
+        # 截止时间的时间戳，到达后不再签到剩余的超话
+        self.deadline = deadline
+        # 签到请求的URL和请求头中不变的部分只构造一次
+        self.checkin_url = f"{self.base_url}/p/aj/general/button?{urlencode(CHECKIN_PARAMS)}"
+        self.bulk_checkin_url = f"{self.base_url}{BULK_CHECKIN_PATH}?{urlencode(CHECKIN_PARAMS)}"
+        self.checkin_headers = {
+            'X-Requested-With': 'XMLHttpRequest',
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Accept': '*/*'
+        }
+        # 是否尝试批量签到
+        self.bulk_checkin = bulk_checkin
+        # 登录失效时用于刷新cookies的CredentialManager，可选
+        self.credentials = credentials
+
+    @property
+    def session(self):
+        """该账号的Session，第一次使用时才创建"""
+        if self._session is None:
+            self._session = self.transport.create_session()
+        return self._session
+
+    def create_pacer(self, adaptive=False, scale=1.0, min_delays=None):
+        """创建该账号的节奏控制"""
+        if adaptive:
+            return AdaptivePacer(scale=scale, min_delays=min_delays)
+        return Pacer(scale=scale, min_delays=min_delays)
+
+    def wait_for_slot(self, endpoint):
+        """等待全局限速调度器分配发送时间片"""
+        if self.scheduler:
+            wait = self.scheduler.acquire(endpoint, self.account_name)
+            self.metrics.observe('weibo_queue_wait_seconds', wait, account=self.account_name, endpoint=endpoint)
+            if wait > 0:
+                self.logger.debug(f"[{self.account_name}] 接口 {endpoint} 限速排队 {wait:.1f}秒")
+
+    def pace(self, kind, delay):
+        """按节奏等待并记录等待时间"""
+        time.sleep(delay)
+        self.metrics.observe('weibo_pacing_wait_seconds', delay, account=self.account_name, kind=kind)
+
+    def request(self, endpoint, method, url, **kwargs):
+        """发送请求，统一设置超时并记录耗时和状态码"""
+        start_time = time.time()
+        status = 'error'
+        try:
+            response = self.session.request(method, url, timeout=self.transport.timeout, **kwargs)
+            status = str(response.status_code)
+            return response
+        except requests.exceptions.RequestException as e:
+            status = type(e).__name__
+            raise
+        finally:
+            self.metrics.observe('weibo_request_seconds', time.time() - start_time,
+                                 account=self.account_name, endpoint=endpoint)
+            self.metrics.inc('weibo_http_responses_total', account=self.account_name,
+                             endpoint=endpoint, status=status)
+
+    def decode_json(self, endpoint, response):
+        """解析JSON响应并记录耗时，解析失败时抛出json.JSONDecodeError"""
+        start_time = time.time()
+        try:
+            return response.json()
+        finally:
+            self.metrics.observe('weibo_json_decode_seconds', time.time() - start_time,
+                                 account=self.account_name, endpoint=endpoint)
 
     # 读取账号
     def load_cookies(self, cookies_dict):
@@ -56,9 +1729,54 @@ class WeiboSuperTopicSigner:
     
     def check_login(self):
         """检查登录状态"""
-        url = "https://weibo.com/"
+        with self.metrics.span('check_login', self.account_name), log_context(phase='login'):
+            return self._check_login()
+
+    def ensure_login(self):
+        """签到前确认登录状态，已经预先检查过时直接返回，登录失效时尝试刷新cookies"""
+        if self.login_verified:
+            self.logger.info(f"[{self.account_name}] 登录状态已预先检查")
+            return True
+        if self.cookies is not None and self.check_login():
+            return True
+        return self.refresh_credentials()
+
+    def recheck_login(self):
+        """签到结果提示未登录时重新检查登录状态，必要时刷新cookies
+        
+        每次运行只重新检查一次，检查通过后仍然提示未登录时认为登录已失效。
+        
+        Returns:
+            bool: 登录是否有效（没有提示未登录时直接返回True）
+        """
+        if not self.logged_out:
+            return True
+        self.logged_out = False
+        if self.login_rechecked:
+            self.logger.error(f"[{self.account_name}] 重新检查登录后签到仍提示未登录")
+            return False
+        self.login_rechecked = True
+        self.login_verified = False
+        self.logger.warning(f"[{self.account_name}] 签到提示未登录，重新检查登录状态")
+        return self.ensure_login()
+
+    def can_refresh_credentials(self):
+        """账号配置了cookies刷新方式"""
+        return self.credentials is not None and self.credentials.can_refresh(self.account_name)
+
+    def refresh_credentials(self):
+        """刷新cookies并重新检查登录状态"""
+        if not self.can_refresh_credentials():
+            return False
+        used = requests.utils.dict_from_cookiejar(self.cookies) if self.cookies is not None else {}
+        cookies = self.credentials.refresh_account(self.account_name, used)
+        return bool(cookies) and self.load_cookies(cookies) and self.check_login()
+
+    def _check_login(self):
+        url = f"{self.base_url}/"
         try:
-            response = self.session.get(url, timeout=10)
+            self.wait_for_slot('login')
+            response = self.request('login', 'GET', url)
             if response.status_code == 200:
                 # 检查页面中是否包含登录用户的标识
                 if self.account_uid == response.headers.get('x-bypass-uid'):
@@ -81,188 +1799,348 @@ class WeiboSuperTopicSigner:
         Returns:
             dict: API响应数据，失败返回None
         """
-        url = f"https://weibo.com/ajax/profile/topicContent?tabid=231093_-_chaohua&page={page}"
+        # 添加随机延迟避免请求过快
+        delay = self.pacer.next_delay('page')
+        self.logger.debug(f"[{self.account_name}] 获取第{page}页超话列表前等待 {delay:.1f}秒...")
+        self.pace('page', delay)
+        return self._fetch_supertopics_page(page)
+
+    def _fetch_supertopics_page(self, page):
+        """请求并解析指定页的超话列表（不包含等待）"""
+        with log_context(phase='topics'):
+            return self._fetch_supertopics_page_data(page)
+
+    def _fetch_supertopics_page_data(self, page):
+        url = f"{self.base_url}/ajax/profile/topicContent?tabid=231093_-_chaohua&page={page}"
         headers = {
             'Accept': 'application/json, text/plain, */*',
             'X-Requested-With': 'XMLHttpRequest',
-            'Referer': f'https://weibo.com/u/page/follow/{self.account_uid}/231093_-_chaohua'
+            'Referer': f'{self.base_url}/u/page/follow/{self.account_uid}/231093_-_chaohua'
         }
         
+        start_time = None
         try:
-            # 添加随机延迟避免请求过快
-            delay = random.uniform(1, 3)
-            self.logger.debug(f"[{self.account_name}] 获取第{page}页超话列表前等待 {delay:.1f}秒...")
-            time.sleep(delay)
-            
-            response = self.session.get(url, headers=headers)
+            self.wait_for_slot('topics')
+            start_time = time.time()
+            response = self.request('topics', 'GET', url, headers=headers)
             response.raise_for_status()
+            elapsed = time.time() - start_time
             
             # 检查响应内容
             if response.status_code != 200:
                 self.logger.error(f"[{self.account_name}] 请求失败，状态码: {response.status_code}")
+                self.pacer.record('page', elapsed, PACE_FAILED)
                 return None
                 
             try:
-                data = response.json()
+                data = self.decode_json('topics', response)
             except json.JSONDecodeError:
                 self.logger.error(f"[{self.account_name}] 响应不是有效的JSON格式: {response.text}")
+                self.pacer.record('page', elapsed, PACE_FAILED)
                 return None
                 
             if data.get('ok') != 1:
                 self.logger.error(f"[{self.account_name}] API返回错误: {data}")
+                outcome = PACE_THROTTLED if is_rate_limited_message(str(data.get('msg', ''))) else PACE_FAILED
+                self.pacer.record('page', elapsed, outcome)
                 return None
             
+            self.pacer.record('page', elapsed, PACE_OK)
             return data
             
         except requests.exceptions.RequestException as e:
+            self.pacer.record('page', time.time() - start_time if start_time else None, request_error_outcome(e))
             self.logger.error(f"[{self.account_name}] 获取第{page}页超话列表时网络错误: {str(e)}", exc_info=True)
         except Exception as e:
             self.logger.error(f"[{self.account_name}] 获取第{page}页超话列表时发生错误: {str(e)}", exc_info=True)
         return None
 
+    def parse_supertopics_page(self, data):
+        """从分页数据中解析关注的超话"""
+        page_topics = []
+        for topic_list in data.get('data', {}).get('list', []):
+            # 只处理关注的超话
+            if topic_list.get('following'):
+                # 从oid中提取容器ID
+                oid_parts = topic_list.get('oid', '').split(':')
+                containerid = oid_parts[-1] if len(oid_parts) > 1 else None
+
+                # 只保留签到需要的字段
+                if containerid:
+                    page_topics.append(Topic(topic_list.get('title', ''), containerid))
+        return page_topics
+
+    def iter_supertopics(self):
+        """逐页产出关注的超话（支持分页）
+        
+        第1页返回总页数后，其余页面在线程池中并发获取（并发数为page_concurrency），
+        但仍按页码顺序产出，并按containerid去重，调用方可以边获取边签到。
+        """
+        self.logger.info(f"[{self.account_name}] 开始获取超话列表...")
+        self.logger.info(f"[{self.account_name}] 正在获取第 1 页...")
+        
+        data = self.get_supertopics_page(1)
+        if not data:
+            self.logger.error(f"[{self.account_name}] 获取第 1 页失败，停止获取")
+            return
+        
+        # 获取分页信息
+        page_info = data.get('data', {})
+        max_page = page_info.get('max_page', 1)
+        total_number = page_info.get('total_number', 0)
+        self.logger.info(f"[{self.account_name}] 第 1 页获取成功，总页数: {max_page}，总超话数: {total_number}")
+        
+        seen = set()
+        count = 0
+        
+        def unseen(page_topics):
+            for topic in page_topics:
+                if topic['containerid'] not in seen:
+                    seen.add(topic['containerid'])
+                    yield topic
+        
+        page_topics = self.parse_supertopics_page(data)
+        self.logger.info(f"[{self.account_name}] 第 1 页获取到 {len(page_topics)} 个关注的超话")
+        for topic in unseen(page_topics):
+            count += 1
+            yield topic
+        
+        # 如果当前页没有数据或者已经到达最大页数，停止获取
+        if page_topics and max_page > 1:
+            workers = max(1, min(self.page_concurrency, max_page - 1))
+            executor = ThreadPoolExecutor(max_workers=workers)
+            try:
+                futures = [executor.submit(self.get_supertopics_page, page) for page in range(2, max_page + 1)]
+                for page, future in enumerate(futures, 2):
+                    data = future.result()
+                    if not data:
+                        self.logger.error(f"[{self.account_name}] 获取第 {page} 页失败，停止获取")
+                        break
+                    page_topics = self.parse_supertopics_page(data)
+                    self.logger.info(f"[{self.account_name}] 第 {page} 页获取到 {len(page_topics)} 个关注的超话")
+                    for topic in unseen(page_topics):
+                        count += 1
+                        yield topic
+                    if not page_topics:
+                        break
+            finally:
+                # 提前结束时取消尚未开始的分页请求
+                executor.shutdown(wait=False, cancel_futures=True)
+        
+        self.logger.info(f"[{self.account_name}] 超话列表获取完成，共 {count} 个关注的超话")
+
     def get_supertopics(self):
         """获取所有关注的超话列表（支持分页）"""
-        all_topics = []
-        current_page = 1
-        max_page = 1
+        with self.metrics.span('get_supertopics', self.account_name):
+            return list(self.iter_supertopics())
+
+    def sync_supertopics(self, cache):
+        """与本地缓存对比，增量同步超话列表
         
-        self.logger.info(f"[{self.account_name}] 开始获取超话列表...")
+        按页获取超话列表，一旦某一页与缓存中的连续片段一致，就认为之后的列表没有变化，
+        直接拼接缓存中剩余的部分并停止请求。若拼接后的数量与接口返回的总数不一致，
+        说明后面还有变化，继续获取下一页。
         
-        while current_page <= max_page:
-            self.logger.info(f"[{self.account_name}] 正在获取第 {current_page} 页...")
-            
-            # 获取当前页数据
-            data = self.get_supertopics_page(current_page)
+        Args:
+            cache (dict): load_topics_cache返回的缓存
             
+        Returns:
+            tuple: (超话列表, 变化情况)，获取失败返回(None, None)
+        """
+        cached = list(cache.get('topics') or [])
+        cached_ids = [t['containerid'] for t in cached]
+        positions = {cid: i for i, cid in enumerate(cached_ids)}
+        
+        self.logger.info(f"[{self.account_name}] 开始增量同步超话列表（本地 {len(cached)} 个）...")
+        fetched = []
+        merged = None
+        page = 1
+        max_page = 1
+        requests_made = 0
+        
+        while page <= max_page:
+            data = self.get_supertopics_page(page)
+            requests_made += 1
             if not data:
-                self.logger.error(f"[{self.account_name}] 获取第 {current_page} 页失败，停止获取")
-                break
+                self.logger.error(f"[{self.account_name}] 获取第 {page} 页失败，停止同步")
+                return None, None
             
-            # 获取分页信息
             page_info = data.get('data', {})
             max_page = page_info.get('max_page', 1)
             total_number = page_info.get('total_number', 0)
-            
-            self.logger.info(f"[{self.account_name}] 第 {current_page} 页获取成功，总页数: {max_page}，总超话数: {total_number}")
-            
-            # 解析当前页的超话数据
-            topics_list = page_info.get('list', [])
-            page_topics = []
-            
-            for topic_list in topics_list:
-                # 只处理关注的超话
-                if topic_list.get('following'):
-                    # 从oid中提取容器ID
-                    oid_parts = topic_list.get('oid', '').split(':')
-                    containerid = oid_parts[-1] if len(oid_parts) > 1 else None
-
-                    # 提取一些超话的内容，可以根据需要进行修改
-                    if containerid:
-                        page_topics.append({
-                            'title': topic_list.get('title', ''),
-                            'containerid': containerid,
-                            'oid': topic_list.get('oid', ''),
-                            'scheme': unquote(topic_list.get('scheme', ''))
-                        })
-            
-            all_topics.extend(page_topics)
-            self.logger.info(f"[{self.account_name}] 第 {current_page} 页获取到 {len(page_topics)} 个关注的超话")
-            
-            # 如果当前页没有数据或者已经到达最大页数，停止获取
-            if not page_topics or current_page >= max_page:
+            page_topics = self.parse_supertopics_page(data)
+            if not page_topics:
                 break
             
-            # 继续获取下一页
-            current_page += 1
+            # 本页与缓存中的某一段一致时，拼接缓存中剩余的部分
+            ids = [t['containerid'] for t in page_topics]
+            start = positions.get(ids[0])
+            if start is not None and cached_ids[start:start + len(ids)] == ids:
+                candidate = self._dedup_topics(fetched + cached[start:])
+                if not total_number or len(candidate) == total_number:
+                    merged = candidate
+                    break
+            
+            fetched.extend(page_topics)
+            page += 1
+        
+        if merged is None:
+            merged = self._dedup_topics(fetched)
         
-        self.logger.info(f"[{self.account_name}] 超话列表获取完成，共 {len(all_topics)} 个关注的超话")
-        return all_topics
+        new_ids = {t['containerid'] for t in merged}
+        old_ids = set(cached_ids)
+        diff = {
+            'added': [topic_dict(t) for t in merged if t['containerid'] not in old_ids],
+            'removed': [topic_dict(t) for t in cached if t['containerid'] not in new_ids]
+        }
+        self.logger.info(f"[{self.account_name}] 增量同步完成，请求 {requests_made} 页，"
+                         f"新增 {len(diff['added'])} 个，取消关注 {len(diff['removed'])} 个，共 {len(merged)} 个")
+        for t in diff['added']:
+            self.logger.info(f"[{self.account_name}]   + {t['title']}")
+        for t in diff['removed']:
+            self.logger.info(f"[{self.account_name}]   - {t['title']}")
+        return merged, diff
 
-    def save_topics(self, topics):
-        """保存超话列表到文件"""
+    @staticmethod
+    def _dedup_topics(topics):
+        """按containerid去重，保持原有顺序"""
+        seen = set()
+        result = []
+        for topic in topics:
+            if topic['containerid'] not in seen:
+                seen.add(topic['containerid'])
+                result.append(topic)
+        return result
+
+    def save_topics(self, topics, diff=None, fetched_at=None):
+        """保存超话列表，同时记录获取时间和有效期"""
+        fetched_at = fetched_at or time.time()
         try:
+            if self.topic_store:
+                self.topic_store.save(self.account_name, topics, fetched_at, self.topics_ttl, diff)
+                self.logger.info(f"[{self.account_name}] 超话列表已保存到 {self.topic_store.path}")
+                return
             with open(self.topics_file, 'w', encoding='utf-8') as f:
-                json.dump(topics, f, ensure_ascii=False, indent=2)
+                json.dump({
+                    'fetched_at': fetched_at,
+                    'ttl': self.topics_ttl,
+                    'last_diff': diff,
+                    'topics': [topic_dict(t) for t in topics]
+                }, f, ensure_ascii=False, indent=2)
             self.logger.info(f"[{self.account_name}] 超话列表已保存到 {self.topics_file}")
         except Exception as e:
             self.logger.error(f"[{self.account_name}] 保存超话列表时出错: {str(e)}", exc_info=True)
 
-    def load_topics(self):
-        """从文件加载超话列表"""
+    def load_topics_cache(self):
+        """加载超话列表缓存
+        
+        使用数据库时，数据库中还没有该账号而存在旧的JSON文件的，导入数据库（只读时直接使用该文件）。
+        
+        Returns:
+            dict: 包含topics、fetched_at、ttl的缓存，不存在或加载失败返回None
+        """
+        if not self.topic_store:
+            return self._load_topics_file()
+        try:
+            cache = self.topic_store.load(self.account_name)
+            if cache is None:
+                cache = self._load_topics_file()
+                if cache and cache.get('topics') and not self.topic_store.read_only:
+                    self.logger.info(f"[{self.account_name}] 将 {self.topics_file} 导入超话列表数据库")
+                    self.save_topics(cache['topics'], cache.get('last_diff'), cache.get('fetched_at'))
+                    cache = self.topic_store.load(self.account_name)
+            return cache
+        except Exception as e:
+            self.logger.error(f"[{self.account_name}] 加载超话列表时出错: {str(e)}", exc_info=True)
+            return None
+
+    def _load_topics_file(self):
+        """从JSON文件加载超话列表缓存"""
         try:
             if os.path.exists(self.topics_file):
                 with open(self.topics_file, 'r', encoding='utf-8') as f:
-                    topics = json.load(f)
-                    self.logger.info(f"[{self.account_name}] 从文件加载 {len(topics)} 个超话")
-                    return topics
+                    cache = json.load(f)
+                if isinstance(cache, list):
+                    # 旧版本只保存了超话列表，使用文件修改时间作为获取时间
+                    cache = {'fetched_at': os.path.getmtime(self.topics_file), 'topics': cache}
+                return cache
             return None
         except Exception as e:
             self.logger.error(f"[{self.account_name}] 加载超话列表时出错: {str(e)}", exc_info=True)
             return None
 
+    def topics_cache_expired(self, cache):
+        """判断超话列表缓存是否已过期"""
+        fetched_at = cache.get('fetched_at')
+        if not fetched_at:
+            return True
+        return time.time() - fetched_at > self.topics_ttl
+
+    def load_topics(self):
+        """加载保存的超话列表"""
+        cache = self.load_topics_cache()
+        if cache is None:
+            return None
+        topics = list(cache.get('topics') or [])
+        self.logger.info(f"[{self.account_name}] 从文件加载 {len(topics)} 个超话")
+        return topics
+
+    def estimate_requests(self, update_topics=False):
+        """根据本地保存的超话列表估计本次运行的请求数
+        
+        Returns:
+            tuple: (超话列表页数, 签到次数, 超话总数)，没有本地列表时返回None
+        """
+        cache = self.load_topics_cache()
+        topics = (cache or {}).get('topics')
+        if not topics:
+            return None
+        pages = 0
+        if update_topics or self.topics_cache_expired(cache):
+            pages = -(-len(topics) // TOPICS_PER_PAGE)
+        signs = sum(1 for t in topics if not (self.sign_state and self.sign_state.is_signed(t['containerid'])))
+        return pages, signs, len(topics)
+
     def sign_topic(self, topic):
         """执行超话签到"""
-        checkin_url = "https://weibo.com/p/aj/general/button"
-
-        topic_id = topic['containerid']
-        topic_url = f"https://weibo.com/p/{topic_id}/super_index"
-        
-        # 构造签到请求参数
-        params = {
-            'ajwvr': '6',
-            'api': 'http://i.huati.weibo.com/aj/super/checkin',
-            'texta': '签到',
-            'textb': '已签到',
-            'status': '0',
-            'id': topic_id,
-            'location': 'page_极速版超话_super_index',
-            'timezone': 'GMT+0800',
-            'lang': 'zh-cn',
-            'plat': 'Win32',
-            'ua': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36 Edg/136.0.0.0',
-            'screen': '1366*768',
-            '__rnd': str(int(time.time() * 1000))
-        }
-        
-        # 签到请求的Referer必须是超话页面
-        headers = {
-            'Referer': topic_url,  # 签到请求必须来自超话页面
-            'X-Requested-With': 'XMLHttpRequest',
-            'Content-Type': 'application/x-www-form-urlencoded',
-            'Accept': '*/*'
-        }
+        # 随机延迟避免请求过快(这里的时间可以自己调整)
+        delay = self.pacer.next_delay('sign')
+        self.logger.debug(f"[{self.account_name}] 签到 {topic['title']} 前等待 {delay:.1f}秒...")
+        with self.metrics.span('sign_topic', self.account_name), \
+                log_context(phase='sign', topic=topic['title']):
+            self.pace('sign', delay)
+            self.wait_for_slot('checkin')
+            return self._send_sign_request(topic)
+
+    def topic_headers(self, topic):
+        """签到请求的请求头，Referer必须是超话页面"""
+        return dict(self.checkin_headers, Referer=f"{self.base_url}/p/{topic['containerid']}/super_index")
+
+    def _send_sign_request(self, topic):
+        """发送签到请求并解析结果（不包含等待）"""
+        # 只有id和__rnd随超话变化，其余参数已经编码在checkin_url中
+        url = f"{self.checkin_url}&id={quote(topic['containerid'])}&__rnd={int(time.time() * 1000)}"
         
         try:
-            # 随机延迟避免请求过快(这里的时间可以自己调整)
-            delay = random.uniform(15, 35)
-            self.logger.debug(f"[{self.account_name}] 签到 {topic['title']} 前等待 {delay:.1f}秒...")
-            time.sleep(delay)
-            
             start_time = time.time()
-            response = self.session.post(checkin_url, params=params, headers=headers)
+            response = self.request('checkin', 'POST', url, headers=self.topic_headers(topic))
             response.raise_for_status()
             elapsed = time.time() - start_time
             
             try:
-                result = response.json()
+                result = self.decode_json('checkin', response)
             except json.JSONDecodeError:
+                self.metrics.inc('weibo_sign_results_total', account=self.account_name, code='invalid_json')
                 self.logger.error(f"[{self.account_name}] 签到响应不是有效的JSON: {response.text}")
+                self.pacer.record('sign', elapsed, PACE_FAILED)
                 return False, "响应不是有效的JSON"
-                
-            if result.get('code') == '100000':
-                self.logger.info(f"[{self.account_name}] 签到成功: {topic['title']} (耗时: {elapsed:.2f}秒)")
-                return True, "签到成功"
-            else:
-                msg = result.get('msg', '未知错误')
-                self.logger.warning(f"[{self.account_name}] 签到失败: {topic['title']}, 原因: {msg} (耗时: {elapsed:.2f}秒)")
-                
-                # 如果是重复签到，也视为成功
-                if "已签到" in msg or "重复签到" in msg:
-                    return True, msg
-                    
-                return False, msg
+            
+            status, message, outcome = self.parse_sign_result(topic, result, elapsed)
+            self.pacer.record('sign', elapsed, outcome)
+            return status, message
                 
         except requests.exceptions.RequestException as e:
+            self.pacer.record('sign', time.time() - start_time, request_error_outcome(e))
             self.logger.error(f"[{self.account_name}] 签到请求网络错误: {str(e)}", exc_info=True)
             return False, f"网络错误: {str(e)}"
         except Exception as e:
@@ -271,9 +2149,119 @@ class WeiboSuperTopicSigner:
             
         return False, "未知错误"
     
+    def parse_sign_result(self, topic, result, elapsed):
+        """解析单个超话的签到结果
+        
+        Returns:
+            tuple: (是否成功, 提示信息, 节奏控制使用的请求结果)
+        """
+        self.metrics.inc('weibo_sign_results_total', account=self.account_name,
+                         code=str(result.get('code', 'unknown')))
+        if result.get('code') == '100000':
+            self.logger.info(f"[{self.account_name}] 签到成功: {topic['title']} (耗时: {elapsed:.2f}秒)")
+            return True, "签到成功", PACE_OK
+        
+        msg = result.get('msg', '未知错误')
+        self.logger.warning(f"[{self.account_name}] 签到失败: {topic['title']}, 原因: {msg} (耗时: {elapsed:.2f}秒)")
+        
+        # 如果是重复签到，也视为成功
+        if "已签到" in msg or "重复签到" in msg:
+            return True, msg, PACE_OK
+        return False, msg, PACE_THROTTLED if is_rate_limited_message(msg) else PACE_FAILED
+    
+    def use_bulk_checkin(self):
+        """是否批量签到（开启了批量签到且没有探测到服务器不支持）"""
+        return self.bulk_checkin and BULK_CHECKIN_SUPPORT.get(self.base_url, True)
+    
+    def _send_bulk_sign_request(self, topics):
+        """发送批量签到请求并解析结果（不包含等待）
+        
+        Returns:
+            list: 每个超话的(是否成功, 提示信息)，服务器不支持批量签到时返回None
+        """
+        url = f"{self.bulk_checkin_url}&__rnd={int(time.time() * 1000)}"
+        data = {'ids': ','.join(t['containerid'] for t in topics)}
+        
+        start_time = time.time()
+        try:
+            response = self.request('checkin_batch', 'POST', url, data=data, headers=self.topic_headers(topics[0]))
+            if response.status_code in (404, 405):
+                return None
+            response.raise_for_status()
+            elapsed = time.time() - start_time
+            try:
+                result = self.decode_json('checkin_batch', response)
+            except json.JSONDecodeError:
+                return None
+            msg = result.get('msg') or ''
+            if is_rate_limited_message(msg):
+                self.logger.warning(f"[{self.account_name}] 批量签到被限流: {msg}")
+                self.pacer.record('sign', elapsed, PACE_THROTTLED)
+                self.bulk_checkin_supported()
+                return [(False, msg)] * len(topics)
+            try:
+                items = {str(item['id']): item for item in result['data']['results']}
+            except (KeyError, TypeError):
+                return None
+            self.bulk_checkin_supported()
+        except requests.exceptions.RequestException as e:
+            self.pacer.record('sign', time.time() - start_time, request_error_outcome(e))
+            self.logger.error(f"[{self.account_name}] 批量签到请求网络错误: {str(e)}", exc_info=True)
+            return [(False, f"网络错误: {str(e)}")] * len(topics)
+        except Exception as e:
+            self.logger.error(f"[{self.account_name}] 批量签到过程中发生错误: {str(e)}", exc_info=True)
+            return [(False, f"系统错误: {str(e)}")] * len(topics)
+        
+        results = []
+        outcomes = set()
+        for topic in topics:
+            item = items.get(topic['containerid'])
+            if item is None:
+                results.append((False, "批量签到没有返回该超话的结果"))
+                continue
+            status, message, outcome = self.parse_sign_result(topic, item, elapsed)
+            results.append((status, message))
+            outcomes.add(outcome)
+        # 一次请求只记录一次，有超话被限流时按限流处理
+        for outcome in (PACE_THROTTLED, PACE_FAILED, PACE_OK):
+            if outcome in outcomes:
+                self.pacer.record('sign', elapsed, outcome)
+                break
+        return results
+    
+    def bulk_checkin_supported(self):
+        """服务器正常解析了批量签到请求，记录该接口可用"""
+        BULK_CHECKIN_SUPPORT[self.base_url] = True
+    
+    def bulk_checkin_unsupported(self):
+        """记录服务器不支持批量签到，之后所有账号都逐个签到"""
+        BULK_CHECKIN_SUPPORT[self.base_url] = False
+        self.logger.warning(f"[{self.account_name}] 服务器不支持批量签到，改为逐个签到")
+    
+    def sign_topics_bulk(self, topics):
+        """批量签到多个超话并处理结果，服务器不支持时逐个签到"""
+        delay = self.pacer.next_delay('sign')
+        self.logger.debug(f"[{self.account_name}] 批量签到 {len(topics)} 个超话前等待 {delay:.1f}秒...")
+        with self.metrics.span('sign_topics_bulk', self.account_name), log_context(phase='sign'):
+            self.pace('sign', delay)
+            self.wait_for_slot('checkin')
+            start_time = time.time()
+            results = self._send_bulk_sign_request(topics)
+        if results is None:
+            self.bulk_checkin_unsupported()
+            for topic in topics:
+                self.sign_and_record(topic)
+            return
+        self.handle_bulk_results(topics, results, time.time() - start_time)
+    
+    def handle_bulk_results(self, topics, results, elapsed):
+        """逐个处理批量签到返回的结果"""
+        for topic, (status, message) in zip(topics, results):
+            self.handle_sign_result(topic, 1, status, message, elapsed)
+    
     def save_sign_results(self):
-        """保存签到结果到文件"""
-        if not self.sign_results:
+        """保存签到结果到文件（已经实时写入results_sink时不再保存）"""
+        if not self.sign_results or self.results_sink:
             return
             
         # 确保结果目录存在
@@ -295,107 +2283,525 @@ class WeiboSuperTopicSigner:
         except Exception as e:
             self.logger.error(f"[{self.account_name}] 保存签到结果时出错: {str(e)}", exc_info=True)
     
+    def iter_topics_to_sign(self, update_topics=False):
+        """逐个产出本次需要签到的超话
+        
+        本地列表未过期时直接使用；过期或要求更新时与本地列表增量同步；
+        本地没有列表（或指定了full_sync）时重新获取全部分页，边获取边产出。
+        
+        Args:
+            update_topics (bool): 是否强制更新超话列表
+        """
+        cache = self.load_topics_cache()
+        cached = (cache or {}).get('topics')
+        
+        # 1. 本地列表未过期，直接使用
+        if cached and not update_topics and not self.topics_cache_expired(cache):
+            self.logger.info(f"[{self.account_name}] 从文件加载 {len(cached)} 个超话")
+            self.topics_total = len(cached)
+            yield from cached
+            return
+        
+        # 2. 本地有列表，增量同步
+        if cached and not self.full_sync:
+            if update_topics:
+                self.logger.info(f"[{self.account_name}] 用户要求更新超话列表，增量同步...")
+            else:
+                self.logger.info(f"[{self.account_name}] 超话列表已过期，增量同步...")
+            with self.metrics.span('get_supertopics', self.account_name):
+                topics, diff = self.sync_supertopics(cache)
+            if topics:
+                self.save_topics(topics, diff)
+            else:
+                self.logger.warning(f"[{self.account_name}] 增量同步失败，使用本地保存的列表")
+                topics = cached
+            self.topics_total = len(topics)
+            yield from topics
+            return
+        
+        if cached:
+            self.logger.info(f"[{self.account_name}] 用户要求更新超话列表，重新获取...")
+        else:
+            self.logger.warning(f"[{self.account_name}] 超话列表文件不存在或加载失败，重新获取...")
+        
+        # 3. 重新获取全部超话列表，第1页返回后即可开始签到
+        self.topics_total = None
+        fetched = []
+        for topic in self.iter_supertopics():
+            fetched.append(topic)
+            yield topic
+        
+        if fetched:
+            self.topics_total = len(fetched)
+            self.save_topics(fetched)
+        elif cached:
+            # 4. 重新获取失败时退回本地保存的列表
+            self.topics_total = len(cached)
+            yield from cached
+
+    def prepare_topics(self, update_topics=False):
+        """获取本次需要签到的完整超话列表，参数同iter_topics_to_sign"""
+        return list(self.iter_topics_to_sign(update_topics))
+
+    def record_result(self, topic, status, message, elapsed, attempts=1):
+        """记录单个超话的签到结果"""
+        result = {
+            'topic': topic['title'],
+            'containerid': topic['containerid'],
+            'status': 'success' if status else 'failed',
+            'message': message,
+            'timestamp': datetime.now().isoformat(),
+            'elapsed': elapsed,
+            'attempts': attempts
+        }
+        self.sign_results.append(result)
+        if self.results_sink:
+            self.results_sink.write(self.account_name, result)
+        self.journal.append(result)
+        if self.sign_state:
+            self.sign_state.mark(result)
+        return result
+
+    def handle_sign_result(self, topic, attempt, status, message, elapsed):
+        """处理一次签到尝试的结果，可重试的失败放入重试队列，否则记录结果"""
+        if not status and is_logged_out_message(message):
+            self.logged_out = True
+        if not status and self.retry_queue is not None:
+            delay = self.retry_queue.schedule(topic, attempt, message)
+            if delay is not None:
+                self.logger.info(f"[{self.account_name}] {topic['title']} 将在 {delay:.0f}秒后重试"
+                                 f"（第{attempt + 1}次尝试）")
+                return
+        self.record_result(topic, status, message, elapsed, attempt)
+
+    def sign_and_record(self, topic, attempt=1):
+        """签到一个超话并处理结果"""
+        start_time = time.time()
+        status, message = self.sign_topic(topic)
+        self.handle_sign_result(topic, attempt, status, message, time.time() - start_time)
+
+    def run_due_retries(self, wait=False):
+        """执行已到期的重试
+        
+        Args:
+            wait (bool): 是否等待并执行队列中剩余的全部重试
+        """
+        while self.retry_queue and not self.retries_cut_off():
+            entry = self.retry_queue.pop_due()
+            if entry is None:
+                if not wait:
+                    return
+                remaining = self.retry_queue.next_due() - time.time()
+                self.logger.info(f"[{self.account_name}] 等待 {remaining:.0f}秒后重试剩余的 "
+                                 f"{len(self.retry_queue)} 个超话...")
+                time.sleep(max(0.0, remaining))
+                continue
+            topic, attempt = entry
+            self.logger.info(f"[{self.account_name}] 重试签到: {topic['title']}（第{attempt}次尝试）")
+            self.sign_and_record(topic, attempt)
+
+    def deadline_passed(self):
+        return self.deadline is not None and time.time() >= self.deadline
+
+    def retries_cut_off(self):
+        """截止时间前来不及执行下一次重试时放弃剩余的重试"""
+        if self.deadline is None or not self.retry_queue:
+            return False
+        if max(time.time(), self.retry_queue.next_due()) < self.deadline:
+            return False
+        self.logger.warning(f"[{self.account_name}] 截止时间前来不及重试，放弃剩余的 "
+                            f"{len(self.retry_queue)} 个超话")
+        self.retry_queue = RetryQueue(self.retry_queue.policies, self.retry_queue.delay_scale)
+        return True
+
+    def load_topic_history(self):
+        """从签到结果中读取最近的历史签到情况"""
+        if not self.results_sink or not hasattr(self.results_sink, 'topic_history'):
+            return {}
+        since = (datetime.now() - timedelta(days=PRIORITY_HISTORY_DAYS)).strftime('%Y-%m-%d')
+        try:
+            return self.results_sink.topic_history(self.account_name, since)
+        except Exception as e:
+            self.logger.error(f"[{self.account_name}] 读取历史签到结果时出错: {str(e)}", exc_info=True)
+            return {}
+
+    def ordered_topics(self, topics):
+        """按优先级排列待签到的超话
+        
+        没有设置权重、历史签到结果也不会改变顺序（没有失败或已经签过的记录）时保持原有顺序
+        （边获取边签到），否则取得完整列表后按topic_priority从高到低排列，优先级相同的保持原有顺序。
+        """
+        history = self.load_topic_history()
+        # 历史全部签到成功的超话优先级都是1，与没有历史的超话相同，排序不会改变顺序
+        history = {cid: h for cid, h in history.items() if topic_priority(1.0, h) != 1.0}
+        if not self.topic_weights and not history:
+            return topics
+        
+        def priority(topic):
+            weight = self.topic_weights.get(topic['containerid'], self.topic_weights.get(topic['title'], 1.0))
+            return topic_priority(float(weight), history.get(topic['containerid']))
+        
+        topics = sorted(topics, key=priority, reverse=True)
+        self.topics_total = len(topics)
+        self.logger.info(f"[{self.account_name}] 按优先级排列 {len(topics)} 个超话，优先签到: "
+                         f"{', '.join(t['title'] for t in topics[:5])}")
+        return topics
+
+    def stop_at_deadline(self, done):
+        """到达截止时间时返回True，并记录剩余未签到的超话数
+        
+        Args:
+            done (int): 已经处理的超话数
+        """
+        if not self.deadline_passed():
+            return False
+        remaining = f"剩余 {self.topics_total - done} 个超话未签到" if self.topics_total else "剩余的超话未签到"
+        self.logger.warning(f"[{self.account_name}] 已到截止时间，停止签到，{remaining}")
+        return True
+
+    def begin_run(self):
+        """开始签到，resume时恢复上次中断前的结果"""
+        previous = self.journal.start(self.resume)
+        # 守护模式下签到器会被重复使用，每次运行重新记录结果
+        self.sign_results = list(previous)
+        self.resumed_ids = {r['containerid'] for r in previous}
+        self.logged_out = False
+        self.login_rechecked = False
+
+    def stop_for_login(self):
+        """登录已失效时停止签到，保留签到日志以便刷新cookies后使用 --resume 继续"""
+        if self.retry_queue:
+            self.retry_queue = RetryQueue(self.retry_queue.policies, self.retry_queue.delay_scale)
+        self.journal.close(completed=False)
+        self.logger.error(f"[{self.account_name}] 登录已失效，停止签到")
+        return False
+
+    def skip_topic(self, topic):
+        """判断是否跳过该超话（上次中断前已有结果，或今天已签到成功）"""
+        if topic['containerid'] in self.resumed_ids:
+            self.logger.info(f"[{self.account_name}] 上次运行已有结果，跳过: {topic['title']}")
+            return True
+        if not self.sign_state or not self.sign_state.is_signed(topic['containerid']):
+            return False
+        self.logger.info(f"[{self.account_name}] 今日已签到，跳过: {topic['title']}")
+        result = {
+            'topic': topic['title'],
+            'containerid': topic['containerid'],
+            'status': 'skipped',
+            'message': '今日已签到',
+            'timestamp': datetime.now().isoformat(),
+            'elapsed': 0.0
+        }
+        self.sign_results.append(result)
+        if self.results_sink:
+            self.results_sink.write(self.account_name, result)
+        return True
+
+    def finish_run(self, total):
+        """输出签到统计并保存结果"""
+        success_count = sum(1 for r in self.sign_results if r['status'] == 'success')
+        skipped_count = sum(1 for r in self.sign_results if r['status'] == 'skipped')
+        self.logger.info(f"[{self.account_name}] 签到完成! 成功: {success_count}/{total - skipped_count}"
+                         f"，跳过今日已签到: {skipped_count}")
+        self.journal.close(completed=True)
+        
+        # 保存签到结果
+        self.save_sign_results()
+
     def run_for_account(self, update_topics=False):
         """为单个账号执行签到流程
         
         Args:
             update_topics (bool): 是否强制更新超话列表
         """
-        if not self.check_login():
+        if not self.ensure_login():
             self.logger.error(f"[{self.account_name}] 登录状态检查失败，跳过该账号")
             return False
             
-        # 获取超话列表逻辑
-        topics = None
+        # 执行签到，需要重新获取超话列表时边获取边签到
+        self.logger.info(f"[{self.account_name}] 开始签到")
+        count = 0
+        batch = []  # 等待批量签到的超话
         
-        # 1. 如果用户要求更新超话列表
-        if update_topics:
-            self.logger.info(f"[{self.account_name}] 用户要求更新超话列表，重新获取...")
-            topics = self.get_supertopics()
-            if topics:
-                self.save_topics(topics)
+        self.begin_run()
+        try:
+            for topic in self.ordered_topics(self.iter_topics_to_sign(update_topics)):
+                if self.stop_at_deadline(count):
+                    # 截止前已经排队的超话仍然签到，只多发一次批量请求
+                    break
+                if not self.recheck_login():
+                    return self.stop_for_login()
+                count += 1
+                # 先处理已到期的重试，穿插在正常签到之间
+                self.run_due_retries()
+                self.logger.info(f"[{self.account_name}] 签到进度: {count}/{self.topics_total or '?'}")
+                if self.skip_topic(topic):
+                    continue
+                if not self.use_bulk_checkin():
+                    self.sign_and_record(topic)
+                    continue
+                batch.append(topic)
+                if len(batch) >= BULK_CHECKIN_SIZE:
+                    self.sign_topics_bulk(batch)
+                    batch = []
+            if batch:
+                self.sign_topics_bulk(batch)
+            if not self.recheck_login():
+                return self.stop_for_login()
+            self.run_due_retries(wait=True)
+        except BaseException:
+            # 签到中断时保留日志，下次可以使用 --resume 继续
+            self.journal.close(completed=False)
+            raise
         
-        # 2. 尝试从文件加载超话列表
-        if topics is None:
-            topics = self.load_topics()
-            
-        # 3. 如果文件不存在或加载失败，重新获取
-        if not topics:
-            self.logger.warning(f"[{self.account_name}] 超话列表文件不存在或加载失败，重新获取...")
-            topics = self.get_supertopics()
-            if topics:
-                self.save_topics(topics)
-            
-        if not topics:
+        if not count and not self.deadline_passed():
+            self.journal.close()
             self.logger.error(f"[{self.account_name}] 无法获取超话列表，跳过该账号")
             return False
-            
-        # 执行签到
-        self.logger.info(f"[{self.account_name}] 开始签到，共 {len(topics)} 个超话")
-        success_count = 0
         
-        for i, topic in enumerate(topics, 1):
-            self.logger.info(f"[{self.account_name}] 签到进度: {i}/{len(topics)}")
+        self.finish_run(count)
+        return True
+
+class AsyncWeiboSuperTopicSigner(WeiboSuperTopicSigner):
+    """基于asyncio的签到器
+    
+    HTTP请求仍由requests在线程池中完成，请求之间的等待交给令牌桶在事件循环中进行，
+    因此一个事件循环可以同时推进大量账号，每个账号仍保持自己的签到间隔。
+    """
+    def __init__(self, account_name=None, logger=None, account_uid=None, pacer=None, executor=None,
+                 **kwargs):
+        super().__init__(account_name, logger, account_uid, pacer=pacer, **kwargs)
+        self.executor = executor
+
+    def create_pacer(self, adaptive=False, scale=1.0, min_delays=None):
+        if adaptive:
+            return AdaptiveTokenBucketPacer(scale=scale, min_delays=min_delays)
+        return TokenBucketPacer(scale=scale, min_delays=min_delays)
+
+    async def _run_blocking(self, func, *args):
+        """在线程池中执行阻塞调用（保留当前的日志字段）"""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self.executor, functools.partial(context.run, func, *args))
+
+    async def sign_topic_async(self, topic):
+        """异步执行超话签到"""
+        with self.metrics.span('sign_topic', self.account_name), \
+                log_context(phase='sign', topic=topic['title']):
+            wait = await self.pacer.acquire('sign')
+            self.metrics.observe('weibo_pacing_wait_seconds', wait, account=self.account_name, kind='sign')
+            self.logger.debug(f"[{self.account_name}] 签到 {topic['title']} 前等待了 {wait:.1f}秒")
+            if self.scheduler:
+                wait = await self.scheduler.acquire_async('checkin', self.account_name)
+                self.metrics.observe('weibo_queue_wait_seconds', wait, account=self.account_name,
+                                     endpoint='checkin')
+            return await self._run_blocking(self._send_sign_request, topic)
+
+    async def sign_topics_bulk_async(self, topics):
+        """sign_topics_bulk的异步版本"""
+        with self.metrics.span('sign_topics_bulk', self.account_name), log_context(phase='sign'):
+            wait = await self.pacer.acquire('sign')
+            self.metrics.observe('weibo_pacing_wait_seconds', wait, account=self.account_name, kind='sign')
+            self.logger.debug(f"[{self.account_name}] 批量签到 {len(topics)} 个超话前等待了 {wait:.1f}秒")
+            if self.scheduler:
+                wait = await self.scheduler.acquire_async('checkin', self.account_name)
+                self.metrics.observe('weibo_queue_wait_seconds', wait, account=self.account_name,
+                                     endpoint='checkin')
             start_time = time.time()
-            status, message = self.sign_topic(topic)
-            elapsed = time.time() - start_time
-            
-            # 记录结果
-            result = {
-                'topic': topic['title'],
-                'containerid': topic['containerid'],
-                'status': 'success' if status else 'failed',
-                'message': message,
-                'timestamp': datetime.now().isoformat(),
-                'elapsed': elapsed
-            }
-            self.sign_results.append(result)
-            
-            if status:
-                success_count += 1
+            results = await self._run_blocking(self._send_bulk_sign_request, topics)
+        if results is None:
+            self.bulk_checkin_unsupported()
+            for topic in topics:
+                await self.sign_and_record_async(topic)
+            return
+        await self._run_blocking(self.handle_bulk_results, topics, results, time.time() - start_time)
+
+    async def sign_and_record_async(self, topic, attempt=1):
+        """异步签到一个超话并处理结果（结果写入文件在线程池中进行）"""
+        start_time = time.time()
+        status, message = await self.sign_topic_async(topic)
+        await self._run_blocking(self.handle_sign_result, topic, attempt, status, message,
+                                 time.time() - start_time)
+
+    async def run_due_retries_async(self, wait=False):
+        """run_due_retries的异步版本"""
+        while self.retry_queue and not self.retries_cut_off():
+            entry = self.retry_queue.pop_due()
+            if entry is None:
+                if not wait:
+                    return
+                remaining = self.retry_queue.next_due() - time.time()
+                self.logger.info(f"[{self.account_name}] 等待 {remaining:.0f}秒后重试剩余的 "
+                                 f"{len(self.retry_queue)} 个超话...")
+                await asyncio.sleep(max(0.0, remaining))
+                continue
+            topic, attempt = entry
+            self.logger.info(f"[{self.account_name}] 重试签到: {topic['title']}（第{attempt}次尝试）")
+            await self.sign_and_record_async(topic, attempt)
+
+    async def run_for_account_async(self, update_topics=False):
+        """异步执行单个账号的签到流程，参数同run_for_account"""
+        if not await self._run_blocking(self.ensure_login):
+            self.logger.error(f"[{self.account_name}] 登录状态检查失败，跳过该账号")
+            return False
+        
+        # 超话列表一般从本地文件加载，需要重新获取时才会发出请求，直接放到线程池中执行
+        topics = await self._run_blocking(self.prepare_topics, update_topics)
+        if not topics:
+            self.logger.error(f"[{self.account_name}] 无法获取超话列表，跳过该账号")
+            return False
+        topics = await self._run_blocking(self.ordered_topics, topics)
+        
+        self.logger.info(f"[{self.account_name}] 开始签到，共 {len(topics)} 个超话")
         
-        self.logger.info(f"[{self.account_name}] 签到完成! 成功: {success_count}/{len(topics)}")
+        # 签到日志、签到状态和结果文件的读写都在线程池中进行，不阻塞其他账号
+        await self._run_blocking(self.begin_run)
+        count = 0
+        batch = []
+        try:
+            for i, topic in enumerate(topics, 1):
+                if self.stop_at_deadline(count):
+                    # 截止前已经排队的超话仍然签到，只多发一次批量请求
+                    break
+                if self.logged_out and not await self._run_blocking(self.recheck_login):
+                    return await self._run_blocking(self.stop_for_login)
+                count = i
+                await self.run_due_retries_async()
+                self.logger.info(f"[{self.account_name}] 签到进度: {i}/{len(topics)}")
+                if await self._run_blocking(self.skip_topic, topic):
+                    continue
+                if not self.use_bulk_checkin():
+                    await self.sign_and_record_async(topic)
+                    continue
+                batch.append(topic)
+                if len(batch) >= BULK_CHECKIN_SIZE:
+                    await self.sign_topics_bulk_async(batch)
+                    batch = []
+            if batch:
+                await self.sign_topics_bulk_async(batch)
+            if self.logged_out and not await self._run_blocking(self.recheck_login):
+                return await self._run_blocking(self.stop_for_login)
+            await self.run_due_retries_async(wait=True)
+        except BaseException:
+            # 签到中断时保留日志，下次可以使用 --resume 继续
+            self.journal.close(completed=False)
+            raise
         
-        # 保存签到结果
-        self.save_sign_results()
+        await self._run_blocking(self.finish_run, count)
         return True
 
-def setup_logging():
-    """配置日志记录"""
-    # 确保日志目录存在
-    os.makedirs(LOGS_DIR, exist_ok=True)
+LOG_MAX_BYTES = 10 * 1024 * 1024  # 单个日志文件的大小上限，超过后轮转
+LOG_BACKUP_COUNT = 5              # 轮转后保留的日志文件数
+
+# 当前代码段的日志字段（account、topic、phase），由log_context设置
+LOG_CONTEXT = contextvars.ContextVar('weibo_log_context', default={})
+ACCOUNT_PREFIX = re.compile(r'^\s*\[([^\]]+)\]')
+
+@contextmanager
+def log_context(**fields):
+    """为这段代码中输出的日志附加字段"""
+    token = LOG_CONTEXT.set({**LOG_CONTEXT.get(), **fields})
+    try:
+        yield
+    finally:
+        LOG_CONTEXT.reset(token)
+
+class LogContextFilter(logging.Filter):
+    """在产生日志的线程中为日志记录附加account、topic、phase字段
     
-    # 创建主日志文件名
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    main_log_file = os.path.join(LOGS_DIR, f"weibo_super_topic_{timestamp}.log")
-    error_log_file = os.path.join(LOGS_DIR, f"weibo_super_topic_error_{timestamp}.log")
+    没有设置account时从消息开头的 [账号名] 中提取。
+    """
+    def filter(self, record):
+        fields = LOG_CONTEXT.get()
+        account = fields.get('account')
+        if account is None and isinstance(record.msg, str):
+            match = ACCOUNT_PREFIX.match(record.msg)
+            account = match.group(1) if match else None
+        record.account = account
+        record.topic = fields.get('topic')
+        record.phase = fields.get('phase')
+        return True
+
+class JsonLogFormatter(logging.Formatter):
+    """每条日志输出为一行JSON"""
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'message': record.getMessage(),
+            'account': getattr(record, 'account', None),
+            'topic': getattr(record, 'topic', None),
+            'phase': getattr(record, 'phase', None),
+            'thread': record.threadName
+        }
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False)
+
+def setup_logging(use_queue=False, json_format=False, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT,
+                  suffix='', to_file=True):
+    """配置日志记录
     
+    Args:
+        use_queue (bool): 通过队列在后台线程中写日志，签到线程不会因写文件而阻塞
+        json_format (bool): 日志文件使用JSON行格式，包含account、topic、phase字段
+        max_bytes (int): 单个日志文件的大小上限，0表示不轮转
+        backup_count (int): 轮转后保留的日志文件数
+        suffix (str): 日志文件名后缀，多个分片进程同时运行时区分各自的日志文件
+        to_file (bool): 是否写入日志文件，--list、--dry-run只输出到控制台
+    """
     # 创建主日志记录器
     logger = logging.getLogger('weibo_super_topic')
     logger.setLevel(logging.DEBUG)
     
-    # 创建文件处理器 - 所有日志
-    file_handler = logging.FileHandler(main_log_file, encoding='utf-8')
-    file_handler.setLevel(logging.INFO)
-    
-    # 创建错误文件处理器 - 只记录错误
-    error_handler = logging.FileHandler(error_log_file, encoding='utf-8')
-    error_handler.setLevel(logging.ERROR)
-    
     # 创建控制台处理器
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
     
     # 创建日志格式
     formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    file_handler.setFormatter(formatter)
-    error_handler.setFormatter(formatter)
     console_handler.setFormatter(formatter)
+    if not to_file:
+        logger.addHandler(console_handler)
+        return logger
+    
+    # 确保日志目录存在
+    os.makedirs(LOGS_DIR, exist_ok=True)
+    
+    # 创建主日志文件名
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    extension = 'jsonl' if json_format else 'log'
+    main_log_file = os.path.join(LOGS_DIR, f"weibo_super_topic_{timestamp}{suffix}.{extension}")
+    error_log_file = os.path.join(LOGS_DIR, f"weibo_super_topic_error_{timestamp}{suffix}.{extension}")
+    
+    # 创建文件处理器 - 所有日志，超过大小上限后轮转
+    file_handler = logging.handlers.RotatingFileHandler(
+        main_log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+    file_handler.setLevel(logging.INFO)
+    
+    # 创建错误文件处理器 - 只记录错误
+    error_handler = logging.handlers.RotatingFileHandler(
+        error_log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+    error_handler.setLevel(logging.ERROR)
+    
+    file_formatter = JsonLogFormatter() if json_format else formatter
+    file_handler.setFormatter(file_formatter)
+    error_handler.setFormatter(file_formatter)
     
     # 添加处理器到主记录器
-    logger.addHandler(file_handler)
-    logger.addHandler(error_handler)
-    logger.addHandler(console_handler)
+    handlers = [file_handler, error_handler, console_handler]
+    if use_queue:
+        # 日志记录放入队列，由后台线程写入文件和控制台
+        log_queue = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        handlers = [logging.handlers.QueueHandler(log_queue)]
+    for handler in handlers:
+        handler.addFilter(LogContextFilter())
+        logger.addHandler(handler)
     
     # 配置根记录器，避免重复日志
     root_logger = logging.getLogger()
@@ -428,21 +2834,1162 @@ def list_accounts(accounts, logger):
         logger.info(f"{idx}. {name}")
     logger.info("-" * 40)
 
+def account_summary(idx, account_name, ok, signer, start_time):
+    """生成单个账号的签到汇总"""
+    results = signer.sign_results if signer else []
+    return {
+        'index': idx,
+        'account': account_name,
+        'status': 'success' if ok else 'failed',
+        'signed': sum(1 for r in results if r['status'] == 'success'),
+        'skipped': sum(1 for r in results if r['status'] == 'skipped'),
+        'total': len(results),
+        'elapsed': time.time() - start_time,
+        'failures': [{'topic': r['topic'], 'message': r['message']} for r in results if r['status'] == 'failed']
+    }
+
+def log_account_header(idx, total, account_name, logger):
+    logger.info(f"\n{'='*50}")
+    logger.info(f"处理账号: {account_name} ({idx}/{total})")
+    logger.info(f"{'='*50}")
+
+def log_run_summary(summaries, logger):
+    """输出所有账号的汇总"""
+    success_accounts = sum(1 for s in summaries if s['status'] == 'success')
+    logger.info(f"\n所有账号处理完成! 成功: {success_accounts}/{len(summaries)}")
+    for s in summaries:
+        logger.info(f"  {s['index']}. {s['account']}: {s['status']}，签到成功 {s['signed']}/{s['total']}"
+                    f"（跳过 {s['skipped']}），耗时 {s['elapsed']:.1f}秒")
+
+def account_name_of(idx, account):
+    return account.get('name', f"账号{idx}")
+
+def name_accounts(accounts):
+    """为未命名的账号按其在账号文件中的位置命名，过滤或分片后同一账号的名称不变"""
+    return [account if 'name' in account else dict(account, name=account_name_of(idx, account))
+            for idx, account in enumerate(accounts, 1)]
+
+def preflight_accounts(accounts, logger, health=None, workers=PREFLIGHT_WORKERS, **signer_kwargs):
+    """签到开始前并发检查所有账号的登录状态
+    
+    登录状态缓存中有效期内检查成功的账号不再请求首页。检查结果写回缓存，
+    登录失效的账号在签到开始前统一列出。
+    
+    Args:
+        accounts (list): 待处理的账号配置
+        health (SessionHealthStore): 登录状态缓存，为None时每个账号都重新检查
+        workers (int): 同时检查的账号数
+        signer_kwargs: 传给签到器构造函数的参数，如transport、scheduler
+        
+    Returns:
+        dict: 账号序号 -> 登录是否有效
+    """
+    status = {}
+    pending = []
+    for idx, account in enumerate(accounts, 1):
+        if health and health.is_healthy(account_name_of(idx, account), account):
+            status[idx] = True
+        else:
+            pending.append((idx, account))
+    
+    logger.info(f"检查 {len(accounts)} 个账号的登录状态（{len(accounts) - len(pending)} 个使用缓存）...")
+    
+    def check(idx, account):
+        account_name = account_name_of(idx, account)
+        try:
+            signer = WeiboSuperTopicSigner(account_name, logger, account.get('uid'), **signer_kwargs)
+            if not (signer.load_cookies(account.get('cookies', {})) or signer.can_refresh_credentials()):
+                return False
+            return signer.ensure_login()
+        except Exception as e:
+            logger.error(f"[{account_name}] 检查登录状态时发生错误: {str(e)}", exc_info=True)
+            return False
+    
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pending)))) as executor:
+            futures = {idx: executor.submit(check, idx, account) for idx, account in pending}
+            for idx, account in pending:
+                status[idx] = futures[idx].result()
+                if health:
+                    health.update(account_name_of(idx, account), account, status[idx])
+        if health:
+            health.save()
+    
+    dead = [account_name_of(idx, accounts[idx - 1]) for idx in sorted(status) if not status[idx]]
+    if dead:
+        logger.warning(f"以下 {len(dead)} 个账号登录已失效，请更新cookies: {', '.join(dead)}")
+    else:
+        logger.info("所有账号登录状态正常")
+    return status
+
+def update_session_health(summaries, health):
+    """签到失败、所有超话都签到失败或签到提示未登录的账号清除登录状态缓存"""
+    if not health:
+        return
+    for s in summaries:
+        attempted = s['total'] - s['skipped']
+        if (s['status'] == 'failed' or (attempted and not s['signed'])
+                or any(is_logged_out_message(f['message']) for f in s['failures'])):
+            health.invalidate(s['account'])
+    health.save()
+
+def process_account(idx, total, account, logger, update_topics=False, **signer_kwargs):
+    """处理单个账号，返回该账号的签到汇总
+    
+    每个账号使用独立的签到器（独立的Session和请求节奏），可在线程中并发调用。
+    signer_kwargs会传给签到器的构造函数，如scheduler、topics_ttl。
+    """
+    account_name = account_name_of(idx, account)
+    log_account_header(idx, total, account_name, logger)
+    
+    start_time = time.time()
+    signer = None
+    ok = False
+    try:
+        signer = WeiboSuperTopicSigner(account_name, logger, account.get('uid'),
+                                       topic_weights=account.get('topic_weights'), **signer_kwargs)
+        if signer.load_cookies(account.get('cookies', {})) or signer.can_refresh_credentials():
+            ok = signer.run_for_account(update_topics=update_topics)
+    except Exception as e:
+        logger.error(f"[{account_name}] 处理账号时发生错误: {str(e)}", exc_info=True)
+    return account_summary(idx, account_name, ok, signer, start_time)
+
+def run_accounts(accounts, logger, update_topics=False, workers=1, login_status=None, **signer_kwargs):
+    """按顺序或使用线程池处理多个账号
+    
+    Args:
+        accounts (list): 待处理的账号配置
+        update_topics (bool): 是否强制更新超话列表
+        workers (int): 同时处理的账号数，1表示逐个处理
+        login_status (dict): preflight_accounts的结果，登录失效的账号直接跳过
+        signer_kwargs: 传给签到器构造函数的参数，如scheduler、topics_ttl
+        
+    Returns:
+        list: 按账号原始顺序排列的汇总结果
+    """
+    total = len(accounts)
+    workers = max(1, min(workers, total or 1))
+    login_status = login_status or {}
+    
+    deadline = signer_kwargs.get('deadline')
+    
+    def task(idx, account):
+        if login_status.get(idx) is False:
+            return account_summary(idx, account_name_of(idx, account), False, None, time.time())
+        # 每个工作线程在处理下一个账号前保持原有的账号间延迟
+        if idx > workers:
+            delay = Pacer(scale=signer_kwargs.get('pacing_scale', 1.0),
+                          min_delays=signer_kwargs.get('pacing_min')).next_delay('account')
+            logger.info(f"\n等待 {delay:.1f}秒后处理账号 {idx}/{total}...")
+            time.sleep(delay)
+        if deadline is not None and time.time() >= deadline:
+            logger.warning(f"[{account_name_of(idx, account)}] 已到截止时间，跳过该账号")
+            return dict(account_summary(idx, account_name_of(idx, account), False, None, time.time()),
+                        status='deadline')
+        return process_account(idx, total, account, logger, update_topics,
+                               login_verified=login_status.get(idx, False), **signer_kwargs)
+    
+    if workers > 1:
+        logger.info(f"使用 {workers} 个工作线程并发处理账号")
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(task, idx, account) for idx, account in enumerate(accounts, 1)]
+        summaries = [future.result() for future in futures]
+    
+    log_run_summary(summaries, logger)
+    return summaries
+
+async def process_account_async(idx, total, account, logger, executor, update_topics=False,
+                                **signer_kwargs):
+    """异步处理单个账号，参数同process_account"""
+    account_name = account_name_of(idx, account)
+    log_account_header(idx, total, account_name, logger)
+    
+    start_time = time.time()
+    signer = None
+    ok = False
+    try:
+        signer = AsyncWeiboSuperTopicSigner(account_name, logger, account.get('uid'), executor=executor,
+                                            topic_weights=account.get('topic_weights'), **signer_kwargs)
+        if signer.load_cookies(account.get('cookies', {})) or signer.can_refresh_credentials():
+            ok = await signer.run_for_account_async(update_topics=update_topics)
+    except Exception as e:
+        logger.error(f"[{account_name}] 处理账号时发生错误: {str(e)}", exc_info=True)
+    return account_summary(idx, account_name, ok, signer, start_time)
+
+def run_accounts_async(accounts, logger, update_topics=False, io_threads=16, login_status=None,
+                       **signer_kwargs):
+    """在单个事件循环上同时处理所有账号
+    
+    Args:
+        accounts (list): 待处理的账号配置
+        update_topics (bool): 是否强制更新超话列表
+        io_threads (int): 执行HTTP请求的线程数
+        login_status (dict): preflight_accounts的结果，登录失效的账号直接跳过
+        signer_kwargs: 传给签到器构造函数的参数，如scheduler、topics_ttl
+        
+    Returns:
+        list: 按账号原始顺序排列的汇总结果
+    """
+    total = len(accounts)
+    login_status = login_status or {}
+    logger.info(f"使用异步模式同时处理 {total} 个账号（请求线程数: {io_threads}）")
+    
+    async def task(idx, account, executor):
+        if login_status.get(idx) is False:
+            return account_summary(idx, account_name_of(idx, account), False, None, time.time())
+        return await process_account_async(idx, total, account, logger, executor, update_topics,
+                                           login_verified=login_status.get(idx, False), **signer_kwargs)
+    
+    async def runner():
+        with ThreadPoolExecutor(max_workers=io_threads) as executor:
+            return await asyncio.gather(*[
+                task(idx, account, executor) for idx, account in enumerate(accounts, 1)
+            ])
+    
+    summaries = list(asyncio.run(runner()))
+    log_run_summary(summaries, logger)
+    return summaries
+
+# 时间预算模式的估算参数
+TIME_BUDGET = {
+    'latency': 0.5,         # 每个请求的响应时间（秒）
+    'max_scale': 4.0,       # 时间充裕时等待时间最多放大的倍数
+    'default_topics': 50,   # 没有本地超话列表的账号按该数量估计
+}
+
+# 时间预算模式下各请求类型的最小等待时间（秒），压缩等待时间时不低于该值
+SAFE_MIN_DELAYS = {
+    'page': 1.0,
+    'sign': 5.0,
+    'account': 10.0
+}
+
+def expected_delay(kind, scale, min_delays):
+    """Pacer.next_delay的期望值: U(low*scale, high*scale)与最小等待时间取较大值"""
+    low, high = PACING_RANGES[kind]
+    a, b = low * scale, high * scale
+    m = min_delays.get(kind, 0.0)
+    if m <= a:
+        return (a + b) / 2
+    if m >= b:
+        return m
+    return (m * (m - a) + (b * b - m * m) / 2) / (b - a)
+
+def estimate_duration(workloads, scale, min_delays, workers=1, concurrent=False, rate_limits=None):
+    """估计处理所有账号需要的时间（秒）
+    
+    Args:
+        workloads (list): 每个账号的(超话列表页数, 签到次数)
+        scale (float): 等待时间倍数
+        min_delays (dict): 各请求类型的最小等待时间
+        workers (int): 同时处理的账号数（线程池模式）
+        concurrent (bool): 所有账号同时处理（异步模式），账号之间不等待
+        rate_limits (dict): 所有账号共享的接口限速
+    """
+    if not workloads:
+        return 0.0
+    latency = TIME_BUDGET['latency']
+    page = expected_delay('page', scale, min_delays) + latency
+    sign = expected_delay('sign', scale, min_delays) + latency
+    times = [latency + pages * page + signs * sign for pages, signs in workloads]
+    
+    if concurrent:
+        duration = max(times)
+    else:
+        workers = max(1, min(workers, len(workloads)))
+        gaps = expected_delay('account', scale, min_delays) * (len(workloads) - workers)
+        duration = max(max(times), (sum(times) + gaps) / workers)
+    
+    # 接口限速决定了总请求数需要的最短时间
+    counts = {
+        'login': len(workloads),
+        'topics': sum(pages for pages, _ in workloads),
+        'checkin': sum(signs for _, signs in workloads)
+    }
+    for endpoint, rate in (rate_limits or {}).items():
+        if rate:
+            duration = max(duration, counts.get(endpoint, 0) / rate)
+    return duration
+
+def estimate_workloads(accounts, logger, update_topics=False, **signer_kwargs):
+    """按本地保存的超话列表和今天的签到状态估计每个账号的请求数（只读取本地文件）
+    
+    没有本地列表的账号需要获取全部分页并签到所有超话，超话数按其他账号的平均值估计，
+    所有账号都没有本地列表时按TIME_BUDGET['default_topics']估计。
+    
+    Returns:
+        list: 每个账号的(超话列表页数, 签到次数, 超话数, 是否为估计值)
+    """
+    estimates = []
+    for idx, account in enumerate(accounts, 1):
+        signer = WeiboSuperTopicSigner(account_name_of(idx, account), logger, account.get('uid'), **signer_kwargs)
+        estimates.append(signer.estimate_requests(update_topics))
+    totals = [estimate[2] for estimate in estimates if estimate]
+    topics = sum(totals) // len(totals) if totals else TIME_BUDGET['default_topics']
+    return [estimate + (False,) if estimate else (-(-topics // TOPICS_PER_PAGE), topics, topics, True)
+            for estimate in estimates]
+
+def plan_time_budget(accounts, budget, logger, update_topics=False, workers=1, concurrent=False,
+                     rate_limits=None, min_delays=None, **signer_kwargs):
+    """根据时间预算计算等待时间倍数
+    
+    按本地保存的超话列表和今天的签到状态估计剩余的请求数，在保证各类等待时间
+    不低于最小值的前提下，找到使预计耗时不超过预算的最大倍数（最多放大到max_scale倍）。
+    
+    Args:
+        accounts (list): 待处理的账号配置
+        budget (float): 时间预算（秒）
+        signer_kwargs: 传给签到器构造函数的参数，用于读取超话列表和签到状态
+        
+    Returns:
+        dict: scale为等待时间倍数，estimate为预计耗时，feasible为能否在预算内完成，
+            accounts为estimate_workloads的结果
+    """
+    min_delays = dict(SAFE_MIN_DELAYS, **(min_delays or {}))
+    estimates = estimate_workloads(accounts, logger, update_topics, **signer_kwargs)
+    workloads = [(pages, signs) for pages, signs, _, _ in estimates]
+    unknown = sum(1 for estimate in estimates if estimate[3])
+    
+    def duration(scale):
+        return estimate_duration(workloads, scale, min_delays, workers, concurrent, rate_limits)
+    
+    max_scale = TIME_BUDGET['max_scale']
+    fastest = duration(0.0)
+    if fastest > budget:
+        scale = 0.0
+    elif duration(max_scale) <= budget:
+        scale = max_scale
+    else:
+        low, high = 0.0, max_scale
+        for _ in range(40):
+            middle = (low + high) / 2
+            if duration(middle) <= budget:
+                low = middle
+            else:
+                high = middle
+        scale = low
+    
+    plan = {
+        'scale': scale,
+        'min_delays': min_delays,
+        'estimate': duration(scale),
+        'default_estimate': duration(1.0),
+        'feasible': fastest <= budget,
+        'pages': sum(pages for pages, _ in workloads),
+        'signs': sum(signs for _, signs in workloads),
+        'accounts': estimates
+    }
+    logger.info(f"时间预算 {budget / 60:.1f}分钟: 预计 {len(accounts)} 个账号共 {plan['pages']} 页超话列表、"
+                f"{plan['signs']} 次签到（{unknown} 个账号没有本地列表，按估计值计算）")
+    logger.info(f"按默认节奏预计需要 {plan['default_estimate'] / 60:.1f}分钟，"
+                f"调整等待时间为默认的 {scale:.2f} 倍，预计需要 {plan['estimate'] / 60:.1f}分钟")
+    if not plan['feasible']:
+        logger.warning(f"时间预算不足: 即使按最小间隔（签到 {min_delays['sign']:.1f}秒）也需要约 "
+                       f"{fastest / 60:.1f}分钟，超出预算 {(fastest - budget) / 60:.1f}分钟")
+    return plan
+
+def dry_run(accounts, logger, update_topics=False, workers=1, concurrent=False, rate_limits=None,
+            scale=1.0, min_delays=None, budget=None, processes=1, **signer_kwargs):
+    """列出本次运行的计划：各账号的请求数和预计耗时，只读取本地文件，不发送请求
+    
+    Args:
+        scale (float): 等待时间倍数，指定了budget时按时间预算计算
+        budget (float): 时间预算（秒）
+        processes (int): 分片进程数，各分片同时运行，接口限速由各分片平分
+    
+    Returns:
+        float: 预计总耗时（秒）
+    """
+    if budget:
+        plan = plan_time_budget(accounts, budget, logger, update_topics, workers, concurrent, rate_limits,
+                                min_delays, **signer_kwargs)
+        scale, min_delays, estimates = plan['scale'], plan['min_delays'], plan['accounts']
+    else:
+        min_delays = min_delays or {}
+        estimates = estimate_workloads(accounts, logger, update_topics, **signer_kwargs)
+    
+    shard_workloads = [[] for _ in range(processes)]
+    logger.info("运行计划（不发送请求）:")
+    logger.info("-" * 40)
+    for idx, (account, (pages, signs, topics, estimated)) in enumerate(zip(accounts, estimates), 1):
+        name = account_name_of(idx, account)
+        index = account_shard(name, processes) if processes > 1 else 0
+        shard_workloads[index].append((pages, signs))
+        duration = estimate_duration([(pages, signs)], scale, min_delays)
+        source = f"没有本地列表，按 {topics} 个估计" if estimated else f"{topics} 个"
+        shard = f"分片{index} " if processes > 1 else ''
+        logger.info(f"{idx}. {shard}{name}: 超话 {source}，获取列表 {pages} 页，签到 {signs} 次，"
+                    f"预计 {duration / 60:.1f}分钟")
+    logger.info("-" * 40)
+    
+    shard_limits = {endpoint: rate / processes for endpoint, rate in (rate_limits or {}).items() if rate}
+    total = max(estimate_duration(workloads, scale, min_delays, workers, concurrent, shard_limits)
+                for workloads in shard_workloads)
+    mode = "所有账号同时处理" if concurrent else f"同时处理 {workers} 个账号"
+    if processes > 1:
+        mode = f"{processes} 个分片进程，每个{mode}"
+    logger.info(f"共 {len(accounts)} 个账号，获取列表 {sum(e[0] for e in estimates)} 页，"
+                f"签到 {sum(e[1] for e in estimates)} 次；{mode}，等待时间为默认的 {scale:.2f} 倍，"
+                f"预计总耗时 {total / 60:.1f}分钟")
+    return total
+
+DAEMON_WINDOW = '08:00-12:00'  # 守护模式下每天签到的时间窗口，各账号的签到时刻在窗口内均匀错开
+DAEMON_POLL_INTERVAL = 30      # 守护模式检查账号文件变化的间隔（秒）
+
+def parse_window(value):
+    """解析 HH:MM-HH:MM 格式的时间窗口，返回(开始秒数, 结束秒数)"""
+    def seconds(text):
+        hour, sep, minute = text.strip().partition(':')
+        if not sep or not (0 <= int(hour) <= 24 and 0 <= int(minute) < 60):
+            raise ValueError
+        return int(hour) * 3600 + int(minute) * 60
+    
+    start, sep, end = value.partition('-')
+    try:
+        window = (seconds(start), seconds(end))
+    except ValueError:
+        window = None
+    if not sep or not window or window[0] >= window[1] or window[1] > 24 * 3600:
+        raise ValueError(f"无效的时间窗口: {value}（格式为 HH:MM-HH:MM）")
+    return window
+
+class SignDaemon:
+    """常驻进程模式
+    
+    每个账号每天在时间窗口内的固定时刻签到一次，各账号的时刻在窗口内均匀错开，
+    避免所有账号集中在同一时间请求。签到器（及其Session和连接池）在多天之间复用，
+    账号文件修改后自动重新加载，cookies变化的账号重新创建签到器。
+    启动时已经过了签到时刻、今天还没有签到的账号会立即补签。
+    设置了notifier时，每个账号签到后的汇总交给notifier，按其时间窗口合并发送通知。
+    """
+    def __init__(self, logger, window=DAEMON_WINDOW, account_name=None, update_topics=False,
+                 poll_interval=DAEMON_POLL_INTERVAL, shard=None, notifier=None, **signer_kwargs):
+        self.logger = logger
+        self.window = parse_window(window) if isinstance(window, str) else window
+        self.account_name = account_name    # 只处理指定名称的账号
+        self.shard = shard                  # 只处理该分片(i, N)的账号
+        self.update_topics = update_topics
+        self.poll_interval = poll_interval
+        self.notifier = notifier
+        self.signer_kwargs = signer_kwargs
+        self.accounts = []
+        self.accounts_mtime = None
+        self.signers = {}   # 账号名 -> (账号配置摘要, 签到器)
+        self.last_run = {}  # 账号名 -> 最近一次签到的日期
+        self._stop = threading.Event()
+
+    def reload_accounts(self):
+        """账号文件修改后重新加载，返回是否重新加载"""
+        try:
+            mtime = os.path.getmtime(ACCOUNTS_FILE)
+        except OSError:
+            if self.accounts_mtime is None:
+                self.logger.error(f"账号文件 {ACCOUNTS_FILE} 不存在")
+                self.accounts_mtime = 0
+            return False
+        if mtime == self.accounts_mtime:
+            return False
+        
+        self.accounts_mtime = mtime
+        accounts = name_accounts(load_accounts(self.logger))
+        if self.account_name:
+            accounts = [acc for acc in accounts if acc.get('name', '').lower() == self.account_name.lower()]
+            if not accounts:
+                self.logger.error(f"未找到账号: {self.account_name}")
+        self.accounts = shard_accounts(accounts, self.shard)
+        if self.signer_kwargs.get('credentials'):
+            self.signer_kwargs['credentials'].track(self.accounts)
+        
+        # 删除已经移除的账号的签到器
+        names = {account_name_of(idx, account) for idx, account in enumerate(self.accounts, 1)}
+        for name in list(self.signers):
+            if name not in names:
+                self.logger.info(f"[{name}] 账号已移除")
+                self.signers.pop(name)
+        for idx, account in enumerate(self.accounts, 1):
+            self.logger.info(f"[{account_name_of(idx, account)}] 每日签到时间: "
+                             f"{self.slot(idx, datetime.now().date()).strftime('%H:%M:%S')}")
+        return True
+
+    def slot(self, idx, day):
+        """第idx个账号在指定日期的签到时刻"""
+        start, end = self.window
+        offset = start + (end - start) * (idx - 0.5) / max(1, len(self.accounts))
+        return datetime.combine(day, datetime.min.time()) + timedelta(seconds=offset)
+
+    def due_accounts(self, now):
+        """返回今天已到签到时刻、还没有签到的账号[(序号, 账号)]"""
+        return [(idx, account) for idx, account in enumerate(self.accounts, 1)
+                if self.last_run.get(account_name_of(idx, account)) != now.date()
+                and self.slot(idx, now.date()) <= now]
+
+    def next_wakeup(self, now):
+        """下一个账号的签到时刻"""
+        times = []
+        for idx, account in enumerate(self.accounts, 1):
+            day = now.date()
+            if self.last_run.get(account_name_of(idx, account)) == day:
+                day += timedelta(days=1)
+            times.append(self.slot(idx, day))
+        return min(times) if times else None
+
+    def get_signer(self, idx, account):
+        """返回账号的签到器，账号配置变化时重新创建"""
+        account_name = account_name_of(idx, account)
+        fingerprint = SessionHealthStore.fingerprint(account)
+        entry = self.signers.get(account_name)
+        if entry and entry[0] == fingerprint:
+            return entry[1]
+        
+        signer = WeiboSuperTopicSigner(account_name, self.logger, account.get('uid'),
+                                       topic_weights=account.get('topic_weights'), **self.signer_kwargs)
+        if not (signer.load_cookies(account.get('cookies', {})) or signer.can_refresh_credentials()):
+            return None
+        self.signers[account_name] = (fingerprint, signer)
+        return signer
+
+    def run_account(self, idx, account, day):
+        """为单个账号执行day这天的签到，返回汇总"""
+        account_name = account_name_of(idx, account)
+        log_account_header(idx, len(self.accounts), account_name, self.logger)
+        start_time = time.time()
+        signer = None
+        ok = False
+        try:
+            signer = self.get_signer(idx, account)
+            if signer:
+                ok = signer.run_for_account(update_topics=self.update_topics)
+        except Exception as e:
+            self.logger.error(f"[{account_name}] 处理账号时发生错误: {str(e)}", exc_info=True)
+        self.last_run[account_name] = day
+        return account_summary(idx, account_name, ok, signer, start_time)
+
+    def run_pending(self, now=None):
+        """重新加载账号文件，并为所有到期的账号签到"""
+        self.reload_accounts()
+        now = now or datetime.now()
+        summaries = []
+        for i, (idx, account) in enumerate(self.due_accounts(now)):
+            if self._stop.is_set():
+                break
+            # 补签多个账号时保持原有的账号间延迟
+            if i > 0:
+                delay = Pacer(scale=self.signer_kwargs.get('pacing_scale', 1.0),
+                              min_delays=self.signer_kwargs.get('pacing_min')).next_delay('account')
+                self.logger.info(f"\n等待 {delay:.1f}秒后处理下一个账号...")
+                if self._stop.wait(delay):
+                    break
+            summaries.append(self.run_account(idx, account, now.date()))
+            if self.notifier:
+                self.notifier.add(summaries[-1:])
+        if summaries:
+            save_run_summary(summaries, self.logger)
+        return summaries
+
+    def run(self):
+        """持续运行，直到stop()被调用或收到KeyboardInterrupt"""
+        start, end = self.window
+        self.logger.info(f"守护模式启动，每日签到时间窗口: {start // 3600:02d}:{start % 3600 // 60:02d}-"
+                         f"{end // 3600:02d}:{end % 3600 // 60:02d}")
+        try:
+            while not self._stop.is_set():
+                self.run_pending()
+                now = datetime.now()
+                wakeup = self.next_wakeup(now)
+                wait = self.poll_interval
+                if wakeup:
+                    wait = min(wait, max(0.0, (wakeup - now).total_seconds()))
+                self._stop.wait(wait)
+        except KeyboardInterrupt:
+            self.logger.info("收到中断信号，守护模式退出")
+
+    def stop(self):
+        self._stop.set()
+
+def save_run_summary(summaries, logger, filepath=None):
+    """保存本次运行的账号汇总，默认保存到结果目录"""
+    if not summaries and not filepath:
+        return None
+    
+    if not filepath:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filepath = os.path.join(RESULTS_DIR, f"run_summary_{timestamp}.json")
+    
+    try:
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump({
+                'timestamp': datetime.now().isoformat(),
+                'accounts': summaries
+            }, f, ensure_ascii=False, indent=2)
+        logger.info(f"运行汇总已保存到 {filepath}")
+        return filepath
+    except Exception as e:
+        logger.error(f"保存运行汇总时出错: {str(e)}", exc_info=True)
+        return None
+
+NOTIFY_RETRY_POLICY = {'max_attempts': 5, 'delay': 30, 'multiplier': 2, 'max_delay': 900}  # 通知发送失败后的退避重试
+NOTIFY_WINDOW = 3600        # 守护模式下合并为一份通知的时间窗口（秒）
+NOTIFY_CLOSE_TIMEOUT = 60   # 运行结束时等待未发送的通知的最长时间（秒）
+NOTIFY_MAX_FAILURES = 10    # 通知中每个账号最多列出的失败超话数
+
+NOTIFY_SENT = 'sent'        # 发送成功
+NOTIFY_RETRY = 'retry'      # 网络错误、HTTP 429/5xx等暂时性失败，稍后重试
+NOTIFY_FAILED = 'failed'    # 地址、认证等配置错误，重试没有意义
+
+def build_digest(summaries, start_time=None, end_time=None):
+    """将多个账号的汇总合并为一份通知摘要"""
+    end_time = end_time or datetime.now()
+    start_time = start_time or end_time
+    success_accounts = sum(1 for s in summaries if s['status'] == 'success')
+    failed = sum(len(s.get('failures') or []) for s in summaries)
+    digest = {
+        'title': f"微博超话签到: {success_accounts}/{len(summaries)} 个账号成功，"
+                 f"签到 {sum(s['signed'] for s in summaries)} 个，失败 {failed} 个",
+        'start': start_time.isoformat(timespec='seconds'),
+        'end': end_time.isoformat(timespec='seconds'),
+        'accounts': [{k: s.get(k) for k in ('account', 'status', 'signed', 'skipped', 'total', 'failures')}
+                     for s in summaries]
+    }
+    digest['text'] = format_digest(digest)
+    return digest
+
+def format_digest(digest):
+    """生成通知的正文"""
+    lines = [digest['title'], f"时间: {digest['start']} ~ {digest['end']}", '']
+    for s in digest['accounts']:
+        lines.append(f"{s['account']}: {s['status']}，签到成功 {s['signed']}/{s['total']}（跳过 {s['skipped']}）")
+        failures = s.get('failures') or []
+        for failure in failures[:NOTIFY_MAX_FAILURES]:
+            lines.append(f"  - {failure['topic']}: {failure['message']}")
+        if len(failures) > NOTIFY_MAX_FAILURES:
+            lines.append(f"  - ……另有 {len(failures) - NOTIFY_MAX_FAILURES} 个超话签到失败")
+    return '\n'.join(lines)
+
+class NotifyChannel(abc.ABC):
+    """通知渠道
+    
+    send发送一份摘要，返回NOTIFY_SENT、NOTIFY_RETRY或NOTIFY_FAILED。
+    返回NOTIFY_RETRY时可以设置retry_after（秒），如服务端返回的Retry-After，
+    min_interval为同一渠道两次发送之间的最小间隔（秒）。
+    """
+    name = 'channel'
+    min_interval = 0.0
+
+    def __init__(self):
+        self.retry_after = None
+
+    @abc.abstractmethod
+    def send(self, digest):
+        """发送一份摘要"""
+
+class WebhookChannel(NotifyChannel):
+    """以JSON POST到webhook地址，内容为 {"title", "text", "digest"}"""
+    name = 'webhook'
+    min_interval = 1.0
+
+    def __init__(self, url, logger, transport=None):
+        super().__init__()
+        self.url = url
+        self.logger = logger
+        self.transport = transport or Transport(logger=logger)
+
+    def send(self, digest):
+        session = self.transport.create_standalone_session()
+        try:
+            response = session.post(self.url, json={'title': digest['title'], 'text': digest['text'],
+                                                    'digest': digest}, timeout=self.transport.timeout)
+        except requests.exceptions.RequestException as e:
+            self.logger.warning(f"发送webhook通知时出错: {str(e)}")
+            return NOTIFY_RETRY
+        finally:
+            session.close()
+        if response.ok:
+            return NOTIFY_SENT
+        self.logger.warning(f"webhook通知返回HTTP {response.status_code}")
+        if response.status_code == 429 or response.status_code >= 500:
+            retry_after = response.headers.get('Retry-After', '')
+            self.retry_after = float(retry_after) if retry_after.isdigit() else None
+            return NOTIFY_RETRY
+        return NOTIFY_FAILED
+
+class SmtpChannel(NotifyChannel):
+    """通过SMTP发送邮件，smtps使用SSL连接，smtp在服务器支持时使用STARTTLS"""
+    name = 'smtp'
+    min_interval = 5.0
+
+    def __init__(self, host, port, sender, recipients, logger, username=None, password=None, use_ssl=False,
+                 timeout=30):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = recipients
+        self.logger = logger
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+
+    def send(self, digest):
+        import smtplib
+        from email.message import EmailMessage
+        message = EmailMessage()
+        message['Subject'] = digest['title']
+        message['From'] = self.sender
+        message['To'] = ', '.join(self.recipients)
+        message.set_content(digest['text'])
+        try:
+            smtp_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+            with smtp_class(self.host, self.port, timeout=self.timeout) as smtp:
+                if not self.use_ssl:
+                    smtp.ehlo()
+                    if smtp.has_extn('starttls'):
+                        smtp.starttls()
+                if self.username:
+                    smtp.login(self.username, self.password or '')
+                smtp.send_message(message)
+            return NOTIFY_SENT
+        except (smtplib.SMTPAuthenticationError, smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused) as e:
+            self.logger.error(f"发送邮件通知失败: {str(e)}")
+            return NOTIFY_FAILED
+        except (smtplib.SMTPException, OSError) as e:
+            self.logger.warning(f"发送邮件通知时出错: {str(e)}")
+            return NOTIFY_RETRY
+
+class FileChannel(NotifyChannel):
+    """将摘要以JSON行追加到文件"""
+    name = 'file'
+
+    def __init__(self, path, logger):
+        super().__init__()
+        self.path = path
+        self.logger = logger
+
+    def send(self, digest):
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(digest, ensure_ascii=False) + '\n')
+            return NOTIFY_SENT
+        except OSError as e:
+            self.logger.warning(f"写入通知文件时出错: {str(e)}")
+            return NOTIFY_RETRY
+
+def create_notify_channel(spec, logger, transport=None):
+    """根据 --notify 参数创建通知渠道
+    
+    支持 https://...（webhook）、file:路径、
+    smtp://用户名:密码@主机:端口?from=发件人&to=收件人1,收件人2（smtps://使用SSL）
+    """
+    if spec.startswith(('http://', 'https://')):
+        return WebhookChannel(spec, logger, transport)
+    if spec.startswith('file:'):
+        path = spec[len('file:'):]
+        if path:
+            return FileChannel(path, logger)
+    elif spec.startswith(('smtp://', 'smtps://')):
+        url = urlsplit(spec)
+        query = parse_qs(url.query)
+        recipients = [r for value in query.get('to', []) for r in value.split(',') if r]
+        username = unquote(url.username) if url.username else None
+        sender = (query.get('from') or [username])[0]
+        if url.hostname and recipients and sender:
+            return SmtpChannel(url.hostname, url.port or (465 if url.scheme == 'smtps' else 25), sender,
+                               recipients, logger, username, unquote(url.password) if url.password else None,
+                               use_ssl=url.scheme == 'smtps')
+    raise ValueError(f"无效的通知地址: {spec}（支持 https://webhook地址、file:路径、"
+                     f"smtp://用户名:密码@主机:端口?from=发件人&to=收件人）")
+
+class NotificationDispatcher:
+    """签到结果通知
+    
+    add收集各账号的汇总，flush将收集到的汇总合并为一份摘要，交给后台线程发送到各个渠道。
+    签到线程只做内存操作，不会因为网络或邮件服务而等待。window不为None时（守护模式），
+    后台线程每window秒自动合并发送一次。发送失败时各渠道按NOTIFY_RETRY_POLICY独立退避重试，
+    同一渠道两次发送之间至少间隔min_interval秒。
+    """
+    def __init__(self, channels, logger, window=None, policy=None):
+        self.channels = list(channels)
+        self.logger = logger
+        self.window = window
+        self.policy = dict(NOTIFY_RETRY_POLICY, **(policy or {}))
+        self.delivered = 0
+        self.dropped = 0
+        self._summaries = []
+        self._window_start = datetime.now()
+        self._heap = []         # (发送时间, 序号, 渠道, 摘要, 第几次尝试)
+        self._seq = 0
+        self._last_sent = {}    # 渠道 -> 上次发送的时间
+        self._sending = 0
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread = None
+
+    def add(self, summaries):
+        """收集账号汇总，不发送"""
+        with self._cond:
+            self._summaries.extend(summaries)
+            self._cond.notify()
+
+    def flush(self):
+        """将已收集的汇总合并为一份摘要并排队发送，返回该摘要，没有汇总时返回None"""
+        with self._cond:
+            return self._flush_locked()
+
+    def _flush_locked(self):
+        now = datetime.now()
+        summaries, self._summaries = self._summaries, []
+        start_time, self._window_start = self._window_start, now
+        if not summaries:
+            return None
+        digest = build_digest(summaries, start_time, now)
+        for channel in self.channels:
+            self._push(time.time(), channel, digest, 1)
+        self._cond.notify()
+        return digest
+
+    def _push(self, due, channel, digest, attempt):
+        heapq.heappush(self._heap, (due, self._seq, channel, digest, attempt))
+        self._seq += 1
+
+    def start(self):
+        """启动后台发送线程"""
+        self._thread = threading.Thread(target=self._run, name='notify', daemon=True)
+        self._thread.start()
+
+    def _next_job(self):
+        """等待下一个到期的发送任务，停止后返回None"""
+        with self._cond:
+            while not self._stop:
+                now = time.time()
+                if self.window and self._summaries and \
+                        now >= self._window_start.timestamp() + self.window:
+                    self._flush_locked()
+                if self._heap and self._heap[0][0] <= now:
+                    job = heapq.heappop(self._heap)
+                    channel = job[2]
+                    # 同一渠道的发送间隔不足时推迟
+                    ready = self._last_sent.get(channel, 0) + channel.min_interval
+                    if ready > now:
+                        self._push(ready, *job[2:])
+                        continue
+                    self._last_sent[channel] = now
+                    self._sending += 1
+                    return job
+                wakeups = [self._heap[0][0]] if self._heap else []
+                if self.window and self._summaries:
+                    wakeups.append(self._window_start.timestamp() + self.window)
+                self._cond.wait(max(0.0, min(wakeups) - now) if wakeups else None)
+        return None
+
+    def _run(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            _, _, channel, digest, attempt = job
+            channel.retry_after = None
+            try:
+                outcome = channel.send(digest)
+            except Exception as e:
+                self.logger.error(f"发送{channel.name}通知时出错: {str(e)}", exc_info=True)
+                outcome = NOTIFY_RETRY
+            with self._cond:
+                self._sending -= 1
+                if outcome == NOTIFY_SENT:
+                    self.delivered += 1
+                    self.logger.info(f"已发送{channel.name}通知: {digest['title']}")
+                elif outcome == NOTIFY_RETRY and attempt < self.policy['max_attempts']:
+                    delay = max(backoff_delay(self.policy, attempt), channel.retry_after or 0)
+                    self.logger.warning(f"{channel.name}通知发送失败，{delay:.0f}秒后第{attempt + 1}次尝试")
+                    self._push(time.time() + delay, channel, digest, attempt + 1)
+                else:
+                    self.dropped += 1
+                    self.logger.error(f"{channel.name}通知发送失败，已放弃: {digest['title']}")
+                self._cond.notify_all()
+
+    def close(self, timeout=NOTIFY_CLOSE_TIMEOUT):
+        """发送剩余的汇总，最多等待timeout秒后停止后台线程
+        
+        Returns:
+            int: 超时后仍未发送的通知数
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            self._flush_locked()
+            while (self._heap or self._sending) and self._thread and time.time() < deadline:
+                # 剩余的重试都在超时之后，不再等待
+                if not self._sending and self._heap[0][0] > deadline:
+                    break
+                self._cond.wait(deadline - time.time())
+            pending = len(self._heap) + self._sending
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=max(0.0, deadline - time.time()) + 1)
+            self._thread = None
+        if pending:
+            self.logger.warning(f"还有 {pending} 个通知未发送成功，已放弃")
+        return pending
+
+def parse_shard(value):
+    """解析 --shard 参数，格式为 i/N（i从0开始），返回(i, N)"""
+    index, sep, count = value.partition('/')
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        sep = None
+    if not sep or count < 1 or not 0 <= index < count:
+        raise ValueError(f"无效的分片设置: {value}（格式为 i/N，0 <= i < N）")
+    return index, count
+
+def account_shard(account_name, count):
+    """按账号名的crc32确定账号所在的分片，账号增减不影响其他账号的分片"""
+    return zlib.crc32(account_name.encode('utf-8')) % count
+
+def shard_accounts(accounts, shard):
+    """返回属于分片shard=(i, N)的账号，shard为None时返回全部账号"""
+    if not shard:
+        return accounts
+    index, count = shard
+    return [account for idx, account in enumerate(accounts, 1)
+            if account_shard(account_name_of(idx, account), count) == index]
+
+def shard_argv(argv, index, count, daemon=False):
+    """生成第index个分片进程的命令行参数
+    
+    去掉--processes和通知参数（由本进程合并汇总后发送通知；守护模式下分片进程不会结束，
+    保留通知参数由各分片自行发送），每个分片的指标和跟踪文件加上分片后缀、
+    指标端口依次加1，接口限速平均分给各个分片，保证所有分片合计不超过设置的速率。
+    """
+    result = []
+    args = list(argv)
+    while args:
+        arg = args.pop(0)
+        option, eq, value = arg.partition('=')
+        takes_value = option in ('--processes', '--metrics-file', '--trace-file', '--metrics-port', '--rate-limit',
+                                 '--notify', '--notify-window')
+        if takes_value and not eq:
+            value = args.pop(0) if args else ''
+        if option == '--processes' or (option in ('--notify', '--notify-window') and not daemon):
+            continue
+        if option in ('--metrics-file', '--trace-file'):
+            value = f"{value}.shard{index}"
+        elif option == '--metrics-port':
+            value = str(int(value) + index)
+        elif option == '--rate-limit':
+            endpoint, _, rate = value.partition('=')
+            value = f"{endpoint}={float(rate) / count:g}"
+        result.extend([option, value] if takes_value else [arg])
+    return result
+
+def run_shards(argv, count, logger, daemon=False):
+    """启动count个分片进程，等待结束后合并各分片的汇总
+    
+    Args:
+        argv (list): 本进程的命令行参数（不含脚本名）
+        count (int): 分片进程数
+        daemon (bool): 是否守护模式（各分片自行发送通知）
+        
+    Returns:
+        list: 按账号文件中的顺序排列的汇总结果
+    """
+    logger.info(f"启动 {count} 个分片进程")
+    summaries = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        processes = []
+        for index in range(count):
+            summary_file = os.path.join(tmp_dir, f"shard_{index}.json")
+            command = [sys.executable, os.path.realpath(__file__), *shard_argv(argv, index, count, daemon),
+                       '--shard', f"{index}/{count}", '--summary-file', summary_file]
+            processes.append((index, summary_file, subprocess.Popen(command)))
+        
+        for index, summary_file, process in processes:
+            returncode = process.wait()
+            if returncode != 0:
+                logger.error(f"分片 {index}/{count} 异常退出，返回码: {returncode}")
+            try:
+                with open(summary_file, 'r', encoding='utf-8') as f:
+                    summaries.extend(json.load(f)['accounts'])
+            except Exception as e:
+                logger.error(f"读取分片 {index}/{count} 的汇总时出错: {str(e)}", exc_info=True)
+    
+    # 按账号文件中的顺序重新编号
+    order = {account_name_of(idx, account): idx for idx, account in enumerate(load_accounts(logger), 1)}
+    summaries.sort(key=lambda s: order.get(s['account'], len(order) + 1))
+    for s in summaries:
+        s['index'] = order.get(s['account'], s['index'])
+    log_run_summary(summaries, logger)
+    return summaries
+
+def parse_rate_limits(values):
+    """解析 --rate-limit 参数，格式为 接口=每秒请求数"""
+    rates = {}
+    for value in values or []:
+        endpoint, sep, rate = value.partition('=')
+        if not sep or endpoint not in ENDPOINT_RATE_LIMITS:
+            raise ValueError(f"无效的限速设置: {value}（可用接口: {', '.join(ENDPOINT_RATE_LIMITS)}）")
+        rate = float(rate)
+        if rate <= 0:
+            raise ValueError(f"限速必须大于0: {value}")
+        rates[endpoint] = rate
+    return rates
+
 def main():
     """主函数，处理多账号签到"""
-    # 设置日志记录
-    logger = setup_logging()
-    logger.info("=" * 60)
-    logger.info(f"微博超话签到脚本启动 (支持分页获取) - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    logger.info("=" * 60)
-    
     # 设置命令行参数
     parser = argparse.ArgumentParser(description='微博超话签到脚本 (支持分页获取完整超话列表)')
     parser.add_argument('-a', '--account', type=str, help='指定要签到的账号名称')
     parser.add_argument('-l', '--list', action='store_true', help='列出所有账号名称')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='只读取本地文件，列出各账号的请求数和预计耗时，不发送请求也不写日志文件')
     parser.add_argument('-u', '--update-topics', action='store_true', 
                         help='强制更新超话列表（默认使用本地保存的列表）')
+    parser.add_argument('--full-sync', action='store_true',
+                        help='更新超话列表时重新获取全部分页（默认与本地列表增量同步）')
+    parser.add_argument('--topics-ttl', type=float, default=TOPICS_TTL / 3600,
+                        help=f'超话列表缓存有效期（小时，默认{TOPICS_TTL // 3600}），过期后自动增量同步')
+    parser.add_argument('--no-skip-signed', action='store_true',
+                        help='不跳过今天已经签到成功的超话')
+    parser.add_argument('--resume', action='store_true',
+                        help='从上次中断的签到日志继续，跳过已有结果的超话')
+    parser.add_argument('--fsync-every', type=int, default=JOURNAL_FSYNC_EVERY,
+                        help=f'签到日志每写入多少条执行一次fsync（默认{JOURNAL_FSYNC_EVERY}，0表示不fsync）')
+    parser.add_argument('--adaptive-pacing', action='store_true',
+                        help='根据响应速度和错误自动调整请求间隔（默认使用固定的随机间隔）')
+    parser.add_argument('--no-retry', action='store_true',
+                        help='签到失败时不在本次运行中重试')
+    parser.add_argument('--bulk-checkin', action='store_true',
+                        help=f'尝试使用批量签到接口，每次请求签到{BULK_CHECKIN_SIZE}个超话（服务器不支持时自动逐个签到）')
+    parser.add_argument('--pool-size', type=int, default=TRANSPORT_SETTINGS['pool_maxsize'],
+                        help=f"共享连接池大小（默认{TRANSPORT_SETTINGS['pool_maxsize']}）")
+    parser.add_argument('--connect-timeout', type=float, default=TRANSPORT_SETTINGS['connect_timeout'],
+                        help=f"建立连接超时秒数（默认{TRANSPORT_SETTINGS['connect_timeout']}）")
+    parser.add_argument('--read-timeout', type=float, default=TRANSPORT_SETTINGS['read_timeout'],
+                        help=f"读取响应超时秒数（默认{TRANSPORT_SETTINGS['read_timeout']}）")
+    parser.add_argument('--http2', action='store_true',
+                        help='使用HTTP/2多路复用（需要安装 httpx[http2]）')
+    parser.add_argument('--pacing-scale', type=float, default=1.0,
+                        help='所有等待时间的倍数（默认1，0表示不等待，仅用于本地模拟服务测试）')
+    parser.add_argument('--no-preflight', action='store_true',
+                        help='不在签到前并发检查所有账号的登录状态（默认先检查，登录失效的账号直接跳过）')
+    parser.add_argument('--health-ttl', type=float, default=SESSION_HEALTH_TTL / 3600,
+                        help=f'登录检查结果缓存有效期（小时，默认{SESSION_HEALTH_TTL // 3600}，0表示每次都检查）')
+    parser.add_argument('--no-credential-refresh', action='store_true',
+                        help='不自动刷新cookies（默认为配置了credentials的账号在过期前或登录失效时刷新）')
+    parser.add_argument('--refresh-ahead', type=float, default=CREDENTIAL_REFRESH_AHEAD / 3600,
+                        help=f'cookies过期前多久开始刷新（小时，默认{CREDENTIAL_REFRESH_AHEAD // 3600}）')
+    parser.add_argument('--topic-store', choices=['sqlite', 'json'], default='sqlite',
+                        help='超话列表保存方式: sqlite为所有账号共用的supertopics.db（默认，自动导入旧的JSON文件），'
+                             'json为每个账号一个文件')
+    parser.add_argument('--results-sink', choices=RESULTS_SINKS, default='jsonl',
+                        help='签到结果保存方式: jsonl为按天轮转的文件（默认），sqlite为results/sign_results.db，'
+                             'json为每次运行每个账号一个文件')
+    parser.add_argument('--log-queue', action='store_true',
+                        help='在后台线程中写日志，签到线程不因写日志而阻塞')
+    parser.add_argument('--log-json', action='store_true',
+                        help='日志文件使用JSON行格式，包含account、topic、phase字段')
+    parser.add_argument('--log-max-size', type=float, default=LOG_MAX_BYTES / 1024 / 1024,
+                        help=f'单个日志文件的大小上限（MB，默认{LOG_MAX_BYTES // 1024 // 1024}），超过后轮转，0表示不轮转')
+    parser.add_argument('--log-backups', type=int, default=LOG_BACKUP_COUNT,
+                        help=f'轮转后保留的日志文件数（默认{LOG_BACKUP_COUNT}）')
+    parser.add_argument('--metrics-file', metavar='PATH',
+                        help='运行结束时将指标以Prometheus文本格式写入该文件')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help='运行期间在 http://127.0.0.1:PORT/metrics 提供指标')
+    parser.add_argument('--trace-file', metavar='PATH',
+                        help='将check_login、get_supertopics、sign_topic的耗时以JSON行写入该文件')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='同时处理的账号数（默认1，即逐个账号处理）')
+    parser.add_argument('--backend', choices=['thread', 'async'], default='thread',
+                        help='执行方式: thread为线程池（默认），async为单个事件循环同时处理所有账号')
+    parser.add_argument('--io-threads', type=int, default=16,
+                        help='异步模式下执行HTTP请求的线程数（默认16）')
+    parser.add_argument('--daemon', action='store_true',
+                        help='常驻运行，每天在时间窗口内为各账号错开时间签到，账号文件修改后自动重新加载')
+    parser.add_argument('--window', default=DAEMON_WINDOW, metavar='HH:MM-HH:MM',
+                        help=f'守护模式下每天签到的时间窗口（默认{DAEMON_WINDOW}）')
+    parser.add_argument('--deadline', metavar='HH:MM|+MIN',
+                        help='截止时间，到达后不再签到剩余的超话和账号，如 07:30 或 +90（90分钟后）；'
+                             '超话按账号配置中的topic_weights和历史签到结果排序，重要的超话先签到')
+    parser.add_argument('--time-budget', type=float, metavar='MINUTES',
+                        help='在该时间（分钟）内完成所有账号，根据预计的请求数压缩或放大等待时间')
+    parser.add_argument('--min-interval', type=float, default=SAFE_MIN_DELAYS['sign'],
+                        help=f"时间预算模式下签到请求之间的最小间隔（秒，默认{SAFE_MIN_DELAYS['sign']}）")
+    parser.add_argument('--shard', metavar='i/N',
+                        help='只处理第i个分片的账号（i从0开始，按账号名的crc32分为N片），用于多进程或多台机器分担')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='启动多个分片进程同时处理账号，结束后合并各分片的汇总（默认1）')
+    parser.add_argument('--summary-file', metavar='PATH',
+                        help='将本次运行的账号汇总写入该文件（默认保存到results目录）')
+    parser.add_argument('--rate-limit', action='append', metavar='ENDPOINT=RPS',
+                        help='所有账号共享的接口限速，如 checkin=0.5，可重复指定'
+                             f"（可用接口: {', '.join(ENDPOINT_RATE_LIMITS)}）")
+    parser.add_argument('--notify', action='append', metavar='SPEC',
+                        help='运行结束后发送签到结果通知，可重复指定: https://webhook地址、file:路径、'
+                             'smtp://用户名:密码@主机:端口?from=发件人&to=收件人（smtps://使用SSL）')
+    parser.add_argument('--notify-window', type=float, default=NOTIFY_WINDOW / 60, metavar='MINUTES',
+                        help=f'守护模式下合并为一份通知的时间窗口（分钟，默认{NOTIFY_WINDOW // 60}）')
     args = parser.parse_args()
+    try:
+        rate_limits = parse_rate_limits(args.rate_limit)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.workers < 1:
+        parser.error("--workers 必须大于等于1")
+    if args.pacing_scale < 0:
+        parser.error("--pacing-scale 不能小于0")
+    if args.io_threads < 1:
+        parser.error("--io-threads 必须大于等于1")
+    try:
+        window = parse_window(args.window)
+        shard = parse_shard(args.shard) if args.shard else None
+        deadline = parse_deadline(args.deadline) if args.deadline else None
+    except ValueError as e:
+        parser.error(str(e))
+    if deadline and args.daemon:
+        parser.error("--deadline 不能与 --daemon 同时使用")
+    if args.time_budget is not None and (args.time_budget <= 0 or args.daemon):
+        parser.error("--time-budget 必须大于0，且不能与 --daemon 同时使用")
+    if args.processes < 1:
+        parser.error("--processes 必须大于等于1")
+    if args.processes > 1 and shard:
+        parser.error("--processes 和 --shard 不能同时使用")
+    if args.notify_window <= 0:
+        parser.error("--notify-window 必须大于0")
+    
+    # 设置日志记录，--list和--dry-run只输出到控制台
+    lightweight = args.list or args.dry_run
+    logger = setup_logging(args.log_queue, args.log_json, int(args.log_max_size * 1024 * 1024),
+                           args.log_backups, f"_shard{shard[0]}of{shard[1]}" if shard else '',
+                           to_file=not lightweight)
+    if not lightweight:
+        logger.info("=" * 60)
+        logger.info(f"微博超话签到脚本启动 (支持分页获取) - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        logger.info("=" * 60)
+    
+    # 通知在后台线程中发送，不阻塞签到；多进程守护模式下由各分片进程发送
+    notifier = None
+    if args.notify and not lightweight and not (args.processes > 1 and args.daemon):
+        try:
+            channels = [create_notify_channel(spec, logger) for spec in args.notify]
+        except ValueError as e:
+            parser.error(str(e))
+        notifier = NotificationDispatcher(channels, logger, args.notify_window * 60 if args.daemon else None)
+        notifier.start()
+    
+    # 多进程模式下由各分片进程处理账号，本进程只合并汇总
+    if args.processes > 1 and not lightweight:
+        summaries = run_shards(sys.argv[1:], args.processes, logger, args.daemon)
+        save_run_summary(summaries, logger, args.summary_file)
+        if notifier:
+            notifier.add(summaries)
+            notifier.close()
+        return
     
     # 加载账号信息
     accounts = load_accounts(logger)
@@ -454,6 +4001,7 @@ def main():
     if args.list:
         list_accounts(accounts, logger)
         return
+    accounts = name_accounts(accounts)
     
     # 处理账号过滤
     if args.account:
@@ -472,37 +4020,119 @@ def main():
         accounts_to_process = accounts
         logger.info(f"将处理所有 {len(accounts)} 个账号")
     
+    if shard:
+        accounts_to_process = shard_accounts(accounts_to_process, shard)
+        logger.info(f"分片 {shard[0]}/{shard[1]}: 处理其中的 {len(accounts_to_process)} 个账号")
+    
+    if args.dry_run:
+        # 只读打开已有的超话列表数据库，数据库不存在时读取各账号的JSON文件
+        topic_store = None
+        if args.topic_store == 'sqlite' and os.path.exists(TOPICS_DB):
+            topic_store = TopicStore(logger=logger, read_only=True)
+        dry_run(accounts_to_process, logger, args.update_topics, args.workers, args.backend == 'async',
+                rate_limits, args.pacing_scale, {'sign': args.min_interval} if args.time_budget else None,
+                args.time_budget * 60 if args.time_budget else None, args.processes, topic_store=topic_store,
+                topics_ttl=args.topics_ttl * 3600, skip_signed=not args.no_skip_signed)
+        if topic_store:
+            topic_store.close()
+        return
+    
     # 显示更新选项状态
     if args.update_topics:
         logger.info("已启用强制更新超话列表选项")
     else:
         logger.info("将使用本地保存的超话列表（如存在）")
     
-    total_accounts = len(accounts_to_process)
-    success_accounts = 0
+    scheduler = EndpointScheduler(rate_limits) if rate_limits else None
+    METRICS.trace_file = args.trace_file
+    if args.metrics_port:
+        port = METRICS.serve(args.metrics_port)
+        logger.info(f"指标地址: http://127.0.0.1:{port}/metrics")
+    transport = Transport({
+        'pool_maxsize': args.pool_size,
+        'connect_timeout': args.connect_timeout,
+        'read_timeout': args.read_timeout,
+        'http2': args.http2
+    }, logger)
+    results_sink = create_result_sink(args.results_sink, logger)
+    topic_store = TopicStore(logger=logger) if args.topic_store == 'sqlite' else None
+    credentials = None
+    if not args.no_credential_refresh:
+        # 后台刷新即将过期的cookies，守护模式下重新加载账号文件时更新管理的账号
+        credentials = CredentialManager(logger, transport=transport, refresh_ahead=args.refresh_ahead * 3600)
+        credentials.track(accounts_to_process)
+        credentials.start()
+    signer_kwargs = {
+        'results_sink': results_sink,
+        'topic_store': topic_store,
+        'transport': transport,
+        'scheduler': scheduler,
+        'topics_ttl': args.topics_ttl * 3600,
+        'full_sync': args.full_sync,
+        'skip_signed': not args.no_skip_signed,
+        'resume': args.resume,
+        'fsync_every': args.fsync_every,
+        'adaptive_pacing': args.adaptive_pacing,
+        'retry': not args.no_retry,
+        'bulk_checkin': args.bulk_checkin,
+        'credentials': credentials,
+        'pacing_scale': args.pacing_scale,
+        'retry_scale': args.pacing_scale,
+        'deadline': deadline
+    }
+    if scheduler:
+        logger.info(f"已启用接口限速: {', '.join(f'{k}={v}/秒' for k, v in rate_limits.items())}")
+    if deadline:
+        logger.info(f"截止时间: {datetime.fromtimestamp(deadline).strftime('%Y-%m-%d %H:%M')}")
+    if args.time_budget:
+        plan = plan_time_budget(accounts_to_process, args.time_budget * 60, logger, args.update_topics,
+                                workers=args.workers, concurrent=args.backend == 'async',
+                                rate_limits=rate_limits, min_delays={'sign': args.min_interval}, **signer_kwargs)
+        signer_kwargs['pacing_scale'] = plan['scale']
+        signer_kwargs['pacing_min'] = plan['min_delays']
     
-    for idx, account in enumerate(accounts_to_process, 1):
-        account_name = account.get('name', f"账号{idx}")
-        cookies = account.get('cookies', {})
-        account_uid = account.get('uid')
-        
-        logger.info(f"\n{'='*50}")
-        logger.info(f"处理账号: {account_name} ({idx}/{total_accounts})")
-        logger.info(f"{'='*50}")
-        
-        # 为每个账号使用主日志记录器
-        signer = WeiboSuperTopicSigner(account_name, logger, account_uid)
-        if signer.load_cookies(cookies):
-            if signer.run_for_account(update_topics=args.update_topics):
-                success_accounts += 1
+    if args.daemon:
+        # 守护模式自行加载账号文件，每个账号签到后单独保存汇总
+        SignDaemon(logger, window, args.account, args.update_topics, shard=shard, notifier=notifier,
+                   **signer_kwargs).run()
+        summaries = []
+    else:
+        # 签到前并发检查登录状态，登录失效的账号提前列出并跳过
+        health = None
+        login_status = None
+        if not args.no_preflight:
+            health = SessionHealthStore(logger, ttl=args.health_ttl * 3600, shard=shard)
+            login_status = preflight_accounts(accounts_to_process, logger, health, **signer_kwargs)
         
-        # 账号间延迟，可以根据需要修改
-        if idx < total_accounts:
-            delay = random.uniform(60, 90)
-            logger.info(f"\n等待 {delay:.1f}秒后处理下一个账号...")
-            time.sleep(delay)
+        if args.backend == 'async':
+            summaries = run_accounts_async(accounts_to_process, logger, update_topics=args.update_topics,
+                                           io_threads=args.io_threads, login_status=login_status,
+                                           **signer_kwargs)
+        else:
+            summaries = run_accounts(accounts_to_process, logger, update_topics=args.update_topics,
+                                     workers=args.workers, login_status=login_status, **signer_kwargs)
+        update_session_health(summaries, health)
+    if notifier:
+        notifier.add(summaries)
+        notifier.close()
+    if scheduler:
+        scheduler.report(logger)
+    if credentials:
+        credentials.stop()
+    transport.close()
+    if results_sink:
+        results_sink.close()
+    if topic_store:
+        topic_store.close()
+    if args.metrics_file:
+        try:
+            METRICS.write(args.metrics_file)
+            logger.info(f"指标已保存到 {args.metrics_file}")
+        except Exception as e:
+            logger.error(f"保存指标时出错: {str(e)}", exc_info=True)
+    METRICS.stop()
+    save_run_summary(summaries, logger, args.summary_file)
     
-    logger.info(f"\n所有账号处理完成! 成功: {success_accounts}/{total_accounts}")
     logger.info("=" * 60)
     logger.info(f"脚本运行结束 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     logger.info("=" * 60)
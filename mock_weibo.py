@@ -0,0 +1,428 @@
+"""
+本地模拟微博服务
+模拟签到流程用到的接口，用于在没有真实cookie的情况下测试和压测签到流程:
+- GET  /                             根据cookie中的SUB返回 x-bypass-uid 响应头
+- GET  /ajax/profile/topicContent    分页返回关注的超话
+- POST /p/aj/general/button          超话签到
+- POST /p/aj/general/batch_button    批量签到，请求体中的ids为逗号分隔的containerid（默认关闭，返回404）
+- POST /sso/v2/refresh               用refresh_token换取新的cookies
+- GET  /sso/v2/qrcode/image          获取登录二维码
+- GET  /sso/v2/qrcode/check          查询扫码状态，qr_scanner指定的用户查询qr_confirm_polls次后确认登录
+- GET  /sso/v2/qrcode/login          扫码确认后的跳转地址，设置cookies
+- POST /notify                       接收签到结果通知的webhook，前notify_failures次返回503
+
+可以设置响应延迟、错误率和每个接口的限流。
+"""
+
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlparse
+
+PAGE_SIZE = 20  # 每页返回的超话数
+
+class MockWeiboState:
+    """模拟服务的数据和配置
+
+    Args:
+        latency (tuple): 每个请求的响应延迟范围（秒）
+        error_rate (float): 返回HTTP 500的概率
+        rate_limits (dict): 各接口每秒允许的请求数，接口名同main.ENDPOINT_RATE_LIMITS
+        rate_limit_mode (str): 'http'表示限流时返回429，'msg'表示返回限流提示
+        page_size (int): 超话列表每页数量
+        bulk_checkin (bool): 是否支持批量签到接口
+    """
+    def __init__(self, latency=(0, 0), error_rate=0.0, rate_limits=None, rate_limit_mode='http',
+                 page_size=PAGE_SIZE, bulk_checkin=False):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limits = dict(rate_limits or {})
+        self.rate_limit_mode = rate_limit_mode
+        self.page_size = page_size
+        self.bulk_checkin = bulk_checkin
+        self.users = {}         # SUB -> {'uid': ..., 'topics': [...]}，同一用户的多个SUB共用一个字典
+        self.profiles = {}      # uid -> 用户，SUB失效后仍可重新登录
+        self.signed = set()     # (uid, containerid, 日期)
+        self.counts = defaultdict(int)      # (接口, 状态码) -> 请求数
+        self.latencies = defaultdict(list)  # 接口 -> 处理耗时
+        self.arrivals = defaultdict(list)   # 接口 -> 请求到达的时间（time.monotonic()）
+        self.lock = threading.Lock()
+        self._buckets = {}      # 接口 -> [令牌数, 上次补充时间]
+        self.refresh_tokens = {}    # refresh_token -> uid
+        self.qr_codes = {}          # qrid -> 查询次数
+        self.tickets = {}           # 扫码登录的跳转ticket -> uid
+        self.qr_scanner = None      # 扫描二维码的用户uid，None表示没有人扫码
+        self.qr_confirm_polls = 2   # 查询多少次后确认登录
+        self._ids = itertools.count(1)
+        self.checkin_failures = {}  # containerid -> 该超话接下来的签到请求返回500的次数
+        self.notifications = []     # webhook收到的通知内容
+        self.notify_failures = 0    # webhook接下来返回503的次数
+
+    def add_user(self, sub, uid, topic_count):
+        """添加一个模拟用户及其关注的超话"""
+        topics = [{
+            'title': f"超话{uid}_{i}",
+            'containerid': f"100808{int(uid):08d}{i:06d}"
+        } for i in range(topic_count)]
+        with self.lock:
+            self.users[sub] = self.profiles[str(uid)] = {'uid': str(uid), 'topics': topics}
+        return topics
+
+    def make_accounts(self, count, topic_count, first_uid=1000):
+        """生成count个模拟用户，返回weibo_accounts.json格式的账号列表"""
+        accounts = []
+        for i in range(count):
+            uid = str(first_uid + i)
+            sub = f"mock-sub-{uid}"
+            self.add_user(sub, uid, topic_count)
+            accounts.append({
+                'name': f"mock{uid}",
+                'uid': uid,
+                'cookies': {'SUB': sub, 'SUBP': f"mock-subp-{uid}"}
+            })
+        return accounts
+
+    def next_id(self):
+        return next(self._ids)
+
+    def new_session(self, uid):
+        """为用户签发新的SUB，返回cookies"""
+        n = self.next_id()
+        sub = f"mock-sub-{uid}-{n}"
+        with self.lock:
+            self.users[sub] = self.profiles[str(uid)]
+        return {'SUB': sub, 'SUBP': f"mock-subp-{uid}-{n}", 'ALF': str(int(time.time()) + 7 * 24 * 3600)}
+
+    def expire_session(self, sub):
+        """使SUB失效，模拟cookie过期"""
+        with self.lock:
+            self.users.pop(sub, None)
+
+    def issue_refresh_token(self, uid):
+        token = f"mock-refresh-{uid}-{self.next_id()}"
+        with self.lock:
+            self.refresh_tokens[token] = str(uid)
+        return token
+
+    def allow(self, endpoint):
+        """按接口限流，超过速率时返回False"""
+        rate = self.rate_limits.get(endpoint)
+        if not rate:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            tokens, last = self._buckets.get(endpoint, (max(1.0, rate), now))
+            tokens = min(max(1.0, rate), tokens + (now - last) * rate)
+            if tokens < 1:
+                self._buckets[endpoint] = (tokens, now)
+                return False
+            self._buckets[endpoint] = (tokens - 1, now)
+            return True
+
+    def record(self, endpoint, status, elapsed):
+        with self.lock:
+            self.counts[(endpoint, status)] += 1
+            self.latencies[endpoint].append(elapsed)
+
+    def stats(self):
+        """返回各接口的请求统计"""
+        with self.lock:
+            return {
+                'counts': {f"{endpoint} {status}": n for (endpoint, status), n in sorted(self.counts.items())},
+                'signed': len(self.signed),
+                'latencies': {endpoint: list(values) for endpoint, values in self.latencies.items()}
+            }
+
+class MockWeiboHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # 支持keep-alive，与真实服务一致
+    disable_nagle_algorithm = True  # 响应头和响应体分开写入，避免keep-alive连接上的延迟确认
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def log_message(self, format, *args):
+        pass
+
+    def _user(self):
+        cookie = SimpleCookie(self.headers.get('Cookie', ''))
+        sub = cookie['SUB'].value if 'SUB' in cookie else None
+        return self.state.users.get(sub)
+
+    def _send(self, status, body=b'', content_type='application/json; charset=utf-8', headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        # 在发送响应前记录，保证客户端收到响应时统计已经更新
+        if self._endpoint:
+            self.state.record(self._endpoint, status, time.time() - self._start_time)
+            self._endpoint = None
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        # headers可以是字典或(名称, 值)列表，列表用于发送多个Set-Cookie
+        for key, value in (headers.items() if isinstance(headers, dict) else headers or []):
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+        return status
+
+    _endpoint = None
+
+    def _handle(self, endpoint, handler):
+        self._endpoint = endpoint
+        self._start_time = time.time()
+        with self.state.lock:
+            self.state.arrivals[endpoint].append(time.monotonic())
+        # 读取请求体，保证keep-alive连接上的下一个请求可以正常解析
+        length = int(self.headers.get('Content-Length') or 0)
+        self._body = self.rfile.read(length).decode('utf-8') if length else ''
+
+        low, high = self.state.latency
+        if high > 0:
+            time.sleep(random.uniform(low, high))
+
+        if random.random() < self.state.error_rate:
+            self._send(500, b'Internal Server Error', 'text/plain')
+        elif not self.state.allow(endpoint):
+            if self.state.rate_limit_mode == 'msg' and endpoint != 'login':
+                body = {'code': '100003', 'msg': '操作过于频繁，请稍后再试'} if endpoint.startswith('checkin') \
+                    else {'ok': 0, 'msg': '操作过于频繁，请稍后再试'}
+                self._send(200, body)
+            else:
+                self._send(429, b'Too Many Requests', 'text/plain')
+        else:
+            handler()
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/':
+            self._handle('login', self._home)
+        elif path == '/ajax/profile/topicContent':
+            self._handle('topics', self._topics)
+        elif path == '/sso/v2/qrcode/image':
+            self._handle('qrcode', self._qrcode_image)
+        elif path == '/sso/v2/qrcode/check':
+            self._handle('qrcode', self._qrcode_check)
+        elif path == '/sso/v2/qrcode/login':
+            self._handle('qrcode', self._qrcode_login)
+        else:
+            self._send(404, b'Not Found', 'text/plain')
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        if path == '/p/aj/general/button':
+            self._handle('checkin', self._checkin)
+        elif path == '/p/aj/general/batch_button':
+            self._handle('checkin_batch', self._checkin_batch)
+        elif path == '/sso/v2/refresh':
+            self._handle('refresh', self._refresh)
+        elif path == '/notify':
+            self._handle('notify', self._notify)
+        else:
+            self._send(404, b'Not Found', 'text/plain')
+
+    def _home(self):
+        user = self._user()
+        # 未登录时与真实首页一样返回200，但没有 x-bypass-uid
+        headers = {'x-bypass-uid': user['uid']} if user else {}
+        return self._send(200, b'<html></html>', 'text/html; charset=utf-8', headers)
+
+    def _topics(self):
+        user = self._user()
+        if not user:
+            return self._send(200, {'ok': -100, 'url': 'https://passport.weibo.com/'})
+
+        query = parse_qs(urlparse(self.path).query)
+        page = int(query.get('page', ['1'])[0])
+        with self.state.lock:
+            topics = list(user['topics'])
+        size = self.state.page_size
+        max_page = max(1, (len(topics) + size - 1) // size)
+        items = [{
+            'title': t['title'],
+            'oid': f"1022:{t['containerid']}",
+            'following': True,
+            'scheme': quote(f"sinaweibo://pageinfo?containerid={t['containerid']}", safe='')
+        } for t in topics[(page - 1) * size:page * size]]
+        return self._send(200, {
+            'ok': 1,
+            'data': {'max_page': max_page, 'total_number': len(topics), 'list': items}
+        })
+
+    def _checkin(self):
+        user = self._user()
+        if not user:
+            return self._send(200, {'code': '100002', 'msg': '请先登录'})
+
+        containerid = parse_qs(urlparse(self.path).query).get('id', [''])[0]
+        with self.state.lock:
+            fail = self.state.checkin_failures.get(containerid, 0) > 0
+            if fail:
+                self.state.checkin_failures[containerid] -= 1
+        if fail:
+            return self._send(500, b'Internal Server Error', 'text/plain')
+        return self._send(200, self._sign(user, containerid))
+
+    def _checkin_batch(self):
+        if not self.state.bulk_checkin:
+            return self._send(404, b'Not Found', 'text/plain')
+        user = self._user()
+        if not user:
+            return self._send(200, {'code': '100002', 'msg': '请先登录'})
+
+        ids = parse_qs(self._body).get('ids', [''])[0].split(',')
+        results = [dict(self._sign(user, containerid), id=containerid) for containerid in ids if containerid]
+        return self._send(200, {'code': '100000', 'msg': '', 'data': {'results': results}})
+
+    def _sign(self, user, containerid):
+        """签到一个超话，返回签到接口的响应内容"""
+        with self.state.lock:
+            if containerid not in {t['containerid'] for t in user['topics']}:
+                return {'code': '382001', 'msg': '超话不存在'}
+            key = (user['uid'], containerid, datetime.now().strftime('%Y%m%d'))
+            already = key in self.state.signed
+            self.state.signed.add(key)
+        if already:
+            return {'code': '382004', 'msg': '今天已签到(382004)'}
+        return {'code': '100000', 'msg': '签到成功', 'data': {'alert_title': '签到成功'}}
+
+    def _query(self, name):
+        return parse_qs(urlparse(self.path).query).get(name, [''])[0]
+
+    def _refresh(self):
+        token = parse_qs(self._body).get('refresh_token', [''])[0]
+        with self.state.lock:
+            uid = self.state.refresh_tokens.pop(token, None)
+        if uid is None:
+            return self._send(200, {'retcode': 50111001, 'msg': 'refresh_token无效'})
+        cookies = self.state.new_session(uid)
+        return self._send(200, {'retcode': 20000000, 'msg': '', 'data': {
+            'cookies': cookies,
+            'refresh_token': self.state.issue_refresh_token(uid),
+            'expires_at': int(cookies['ALF'])
+        }})
+
+    def _notify(self):
+        with self.state.lock:
+            if self.state.notify_failures > 0:
+                self.state.notify_failures -= 1
+                fail = True
+            else:
+                self.state.notifications.append(json.loads(self._body))
+                fail = False
+        if fail:
+            return self._send(503, b'Service Unavailable', 'text/plain', {'Retry-After': '0'})
+        return self._send(200, {'ok': 1})
+
+    def _qrcode_image(self):
+        qrid = f"mock-qr-{self.state.next_id()}"
+        with self.state.lock:
+            self.state.qr_codes[qrid] = 0
+        host = self.headers.get('Host')
+        return self._send(200, {'retcode': 20000000, 'data': {'qrid': qrid, 'image': f"http://{host}/qrcode/{qrid}.png"}})
+
+    def _qrcode_check(self):
+        qrid = self._query('qrid')
+        with self.state.lock:
+            if qrid not in self.state.qr_codes:
+                return self._send(200, {'retcode': 50114004, 'msg': '二维码已失效'})
+            self.state.qr_codes[qrid] += 1
+            confirmed = self.state.qr_scanner and self.state.qr_codes[qrid] >= self.state.qr_confirm_polls
+            if confirmed:
+                del self.state.qr_codes[qrid]
+                ticket = f"mock-ticket-{self.state.next_id()}"
+                self.state.tickets[ticket] = self.state.qr_scanner
+        if not confirmed:
+            return self._send(200, {'retcode': 50114001, 'msg': '未使用'})
+        host = self.headers.get('Host')
+        return self._send(200, {'retcode': 20000000, 'data': {'url': f"http://{host}/sso/v2/qrcode/login?ticket={ticket}"}})
+
+    def _qrcode_login(self):
+        with self.state.lock:
+            uid = self.state.tickets.pop(self._query('ticket'), None)
+        if uid is None:
+            return self._send(403, b'Forbidden', 'text/plain')
+        cookies = self.state.new_session(uid)
+        headers = [('Set-Cookie', f"{name}={value}; Path=/") for name, value in cookies.items()]
+        return self._send(200, b'<html></html>', 'text/html; charset=utf-8', headers)
+
+class MockWeiboServer:
+    """在后台线程中运行的模拟微博服务，可作为上下文管理器使用"""
+    def __init__(self, state=None, host='127.0.0.1', port=0):
+        self.state = state or MockWeiboState()
+        self.httpd = ThreadingHTTPServer((host, port), MockWeiboHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = self.state
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟微博服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--accounts', type=int, default=2, help='模拟账号数')
+    parser.add_argument('--topics', type=int, default=50, help='每个账号关注的超话数')
+    parser.add_argument('--latency', type=float, nargs=2, default=(0, 0), metavar=('MIN', 'MAX'),
+                        help='响应延迟范围（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回HTTP 500的概率')
+    parser.add_argument('--rate-limit', action='append', metavar='ENDPOINT=RPS',
+                        help='接口限流，如 checkin=5（接口: login, topics, checkin）')
+    parser.add_argument('--rate-limit-mode', choices=['http', 'msg'], default='http',
+                        help='限流时返回429还是返回限流提示')
+    parser.add_argument('--bulk-checkin', action='store_true', help='支持批量签到接口')
+    parser.add_argument('--write-accounts', metavar='FILE',
+                        help='将模拟账号写入文件，格式同weibo_accounts.json')
+    args = parser.parse_args()
+
+    rate_limits = {}
+    for value in args.rate_limit or []:
+        endpoint, _, rate = value.partition('=')
+        rate_limits[endpoint] = float(rate)
+
+    state = MockWeiboState(tuple(args.latency), args.error_rate, rate_limits, args.rate_limit_mode,
+                           bulk_checkin=args.bulk_checkin)
+    accounts = state.make_accounts(args.accounts, args.topics)
+    if args.write_accounts:
+        with open(args.write_accounts, 'w', encoding='utf-8') as f:
+            json.dump(accounts, f, ensure_ascii=False, indent=2)
+
+    server = MockWeiboServer(state, args.host, args.port)
+    print(f"模拟微博服务已启动: {server.url}")
+    print(f"使用方式: WEIBO_BASE_URL={server.url} WEIBO_PASSPORT_URL={server.url} python main.py --pacing-scale 0")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(json.dumps({k: v for k, v in state.stats().items() if k != 'latencies'},
+                         ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+签到结果查询
+统计按天轮转的JSONL结果文件或SQLite结果库中的签到成功率，可按超话、账号或日期分组。
+SQLite使用索引查询，JSONL只读取日期范围内的文件。
+"""
+
+import argparse
+import os
+import unicodedata
+
+import main
+
+def display_width(text):
+    """终端显示宽度，中文等全角字符占两列"""
+    return sum(2 if unicodedata.east_asian_width(ch) in ('W', 'F') else 1 for ch in text)
+
+def pad(text, width, align='<'):
+    """按显示宽度补齐空格，使中文表头与数字列对齐"""
+    text = str(text)
+    fill = ' ' * max(width - display_width(text), 0)
+    return text + fill if align == '<' else fill + text
+
+COLUMN_WIDTHS = (8, 8, 8, 8, 8)
+
+def format_stats(stats, group_by):
+    """将统计结果格式化为文本表格"""
+    header = {'topic': '超话', 'account': '账号', 'date': '日期'}[group_by]
+    width = max([display_width(str(s['key'])) for s in stats] + [display_width(header)])
+
+    def row(key, values):
+        return '  '.join([pad(key, width)] + [pad(v, w, '>') for v, w in zip(values, COLUMN_WIDTHS)])
+
+    lines = [row(header, ['总数', '成功', '失败', '跳过', '成功率'])]
+    for s in stats:
+        rate = f"{s['rate'] * 100:.1f}%" if s['rate'] is not None else '-'
+        lines.append(row(s['key'], [s['total'], s['success'], s['failed'], s['skipped'], rate]))
+    return '\n'.join(lines)
+
+def main_cli():
+    parser = argparse.ArgumentParser(description='统计签到成功率')
+    parser.add_argument('--by', choices=list(main.RESULT_GROUPS), default='topic',
+                        help='分组方式: topic为按超话（默认），account为按账号，date为按日期')
+    parser.add_argument('--sink', choices=['jsonl', 'sqlite'],
+                        help='读取的结果来源（默认存在sign_results.db时使用sqlite）')
+    parser.add_argument('-a', '--account', help='只统计该账号')
+    parser.add_argument('--since', metavar='YYYY-MM-DD', help='开始日期（包含）')
+    parser.add_argument('--until', metavar='YYYY-MM-DD', help='结束日期（包含）')
+    parser.add_argument('--min-rate', type=float, metavar='PERCENT',
+                        help='只显示成功率低于该百分比的分组')
+    args = parser.parse_args()
+
+    kind = args.sink or ('sqlite' if os.path.exists(os.path.join(main.RESULTS_DIR, 'sign_results.db'))
+                         else 'jsonl')
+    sink = main.create_result_sink(kind)
+    try:
+        stats = main.query_results(sink, args.by, args.account, args.since, args.until)
+    finally:
+        sink.close()
+    if args.min_rate is not None:
+        stats = [s for s in stats if s['rate'] is not None and s['rate'] * 100 < args.min_rate]
+    if not stats:
+        print('没有符合条件的签到结果')
+        return
+    print(format_stats(stats, args.by))
+
+if __name__ == "__main__":
+    main_cli()